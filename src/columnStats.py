@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+
+from sklearn import preprocessing
+import numpy as np
+
+class ColumnStats:
+    '''
+    Per column sample count, mean and sum of squared deviations from the
+    mean of a block of samples, accumulated in float64.  Blocks combine w/
+    the pairwise form of Welford's update (Chan et al.), so the statistics of
+    chunks and parallel shards merge exactly, and a block's statistics can
+    be removed again the same way.
+    '''
+
+    # Rows summarized at a time, bounding the float64 temporaries
+    blockSize = 1 << 16
+
+    def __init__( self, data=None, nFeatures=0 ):
+        '''
+        Constructor
+        @param data: samples by feature array to summarize, if any
+        @param nFeatures: number of features when starting w/o samples
+        '''
+        if data is not None:
+            nFeatures = data.shape[1]
+
+        self.count = 0
+        self.mean = np.zeros( nFeatures )
+        self.m2 = np.zeros( nFeatures )
+
+        if data is None:
+            return
+
+        # Summarize the samples a block of rows at a time
+        for i in range( 0, len( data ), self.blockSize ):
+            block = np.asarray( data[i:i + self.blockSize], dtype=np.float64 )
+            mBlockStats = ColumnStats( nFeatures=nFeatures )
+            mBlockStats.count = len( block )
+            mBlockStats.mean = np.mean( block, 0 )
+            mBlockStats.m2 = np.sum( ( block - mBlockStats.mean ) ** 2, 0 )
+            self.merge( mBlockStats )
+
+
+    def merge( self, other ):
+        '''
+        Add the samples summarized by another block
+        @param other: ColumnStats of the same features
+        @return stats: this ColumnStats, updated
+        '''
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean = np.copy( other.mean )
+            self.m2 = np.copy( other.m2 )
+            return self
+
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / n
+        self.m2 = ( self.m2 + other.m2 +
+                    delta ** 2 * self.count * other.count / n )
+        self.count = n
+        return self
+
+
+    def remove( self, other ):
+        '''
+        Take out the samples summarized by another block, the reverse of
+        merge()
+        @param other: ColumnStats of a subset of this block's samples
+        @return stats: this ColumnStats, updated
+        '''
+        if other.count == 0:
+            return self
+
+        n = self.count - other.count
+        assert( n >= 0 )
+        if n == 0:
+            ColumnStats.__init__( self, nFeatures=len( self.mean ) )
+            return self
+
+        mean = ( self.count * self.mean - other.count * other.mean ) / n
+        delta = other.mean - mean
+        self.m2 = np.maximum( self.m2 - other.m2 -
+                              delta ** 2 * n * other.count / self.count, 0 )
+        self.mean = mean
+        self.count = n
+        return self
+
+
+    def project( self, idx ):
+        '''
+        @param idx: column indices to keep
+        @return stats: ColumnStats of the given columns only
+        '''
+        mStats = ColumnStats( nFeatures=len( idx ) )
+        mStats.count = self.count
+        mStats.mean = self.mean[idx]
+        mStats.m2 = self.m2[idx]
+        return mStats
+
+
+    def variance( self ):
+        '''@return var: per column population variance'''
+        return self.m2 / max( self.count, 1 )
+
+
+    def scaler( self ):
+        '''
+        @return scaler: StandardScaler fitted to these statistics, w/o
+        another pass over the samples.  Constant columns keep a unit scale,
+        and the scaler transforms in place.
+        '''
+        var = self.variance()
+        scale = np.sqrt( var )
+        eps = np.finfo( np.float64 ).eps
+        scale[var <= ( self.count * eps * self.mean ) ** 2] = 1
+
+        mScaler = preprocessing.StandardScaler( copy=False )
+        mScaler.n_features_in_ = len( self.mean )
+        mScaler.n_samples_seen_ = np.int64( self.count )
+        mScaler.mean_ = np.copy( self.mean )
+        mScaler.var_ = var
+        mScaler.scale_ = scale
+        return mScaler
+
+
+    def __len__( self ):
+        return len( self.mean )
@@ -13,6 +13,10 @@ class DecisionTreeClassifier( LearningAgent ):
     Decision Tree implementation of the LearningAgent base class
     '''
 
+    # Hyperparameters tuned by searchParams()
+    paramSetters = {'maxDepth': 'setMaxDepth'}
+    searchGrid = {'maxDepth': [None, 2, 4, 8, 16, 32]}
+
     def __init__( self , featureExtractor ):
         '''
         @param featureExtractor: FeatureExtractor object for fetching
@@ -22,8 +26,11 @@ class DecisionTreeClassifier( LearningAgent ):
         # Invoke the super's constructor with the FeatureExtractor
         super().__init__( featureExtractor )
 
+        # Grow the tree to full depth by default
+        self.maxDepth = None
+
         # Create the classifier
-        self.clf = tree.DecisionTreeClassifier()
+        self.clf = tree.DecisionTreeClassifier( max_depth=self.maxDepth )
 
 
     def trainModel( self ):
@@ -67,6 +74,14 @@ class DecisionTreeClassifier( LearningAgent ):
         pass
 
 
+    def setMaxDepth( self, depth ):
+        '''Setter for maximum tree depth, None grows the tree fully'''
+        self.maxDepth = depth
+
+        # Re-configure the classifier
+        self.clf = tree.DecisionTreeClassifier( max_depth=self.maxDepth )
+
+
     def getClfCoeffs( self ):
         '''Return array of dTree feature importances'''
         return self.clf.feature_importances_
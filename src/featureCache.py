@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from featureStore import FeatureStore
+import numpy as np
+import hashlib
+import inspect
+import os
+
+class FeatureCache:
+    '''
+    On disk cache of extracted features.  Entries are feature stores keyed
+    by a hash of the input file, the filter file and the source code of the
+    extractor, so a change to any of them misses the cache.  The least 
+    recently used entries are evicted once the cache exceeds its size cap.
+    '''
+
+    def __init__( self, cacheDir, maxBytes=2**32 ):
+        '''
+        Constructor
+        @param cacheDir: directory holding the cached feature stores
+        @param maxBytes: size cap of the cache directory
+        '''
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+
+        if not os.path.isdir( self.cacheDir ):
+            os.makedirs( self.cacheDir )
+
+
+    def key( self, inputPath, filterPath, extractorClass, dtype=None ):
+        '''
+        Generate the cache key of an extraction
+        @param inputPath: input resource to be extracted, or list of them
+        @param filterPath: feature filter resource
+        @param extractorClass: FeatureExtractor implementation class
+        @param dtype: training data dtype, if not the extractor's default
+        @return key: hex digest
+        '''
+        mHash = hashlib.sha1()
+
+        # Input and filter contents
+        if isinstance( inputPath, str ):
+            inputPath = [inputPath]
+        for fPath in inputPath + [filterPath]:
+            with open( fPath, 'rb' ) as f:
+                for block in iter( lambda: f.read( 2**20 ), b'' ):
+                    mHash.update( block )
+            mHash.update( b'\0' )
+
+        # Extractor version - source of the modules the class is built from,
+        # along w/ the modules of the classes those import
+        mModules = set()
+        for cls in inspect.getmro( extractorClass ):
+            module = inspect.getmodule( cls )
+            mModules.add( module )
+            mModules.update( [inspect.getmodule( obj ) for obj in 
+                              vars( module ).values() if inspect.isclass( obj )] )
+
+        # Only this package's own source counts towards the version
+        mSources = [m.__file__ for m in mModules 
+                    if getattr( m, '__file__', None ) and 
+                    self.isLocal( m.__file__ )]
+        for mSourcePath in sorted( mSources ):
+            with open( mSourcePath, 'rb' ) as f:
+                mHash.update( f.read() )
+
+        # Training data dtype
+        if dtype is not None:
+            mHash.update( np.dtype( dtype ).str.encode() )
+
+        return mHash.hexdigest()
+
+
+    def isLocal( self, fPath ):
+        '''True if the module file lives alongside this one'''
+        return ( os.path.dirname( os.path.abspath( fPath ) ) == 
+                 os.path.dirname( os.path.abspath( __file__ ) ) )
+
+
+    def storePath( self, key ):
+        '''@return path: feature store location of a cache key'''
+        return os.path.join( self.cacheDir, key + '.npy' )
+
+
+    def lookup( self, key ):
+        '''
+        Look up a cache key, marking the entry as recently used
+        @return featureStore: FeatureStore of the entry, None on a miss
+        '''
+        mPath = self.storePath( key )
+
+        # The features file is written last, so its presence marks a 
+        # complete entry
+        if not os.path.isfile( mPath + '.features' ):
+            return None
+
+        # Log status - TODO: move this to a logging class
+        print( 'Loading cached features %s..' % key )
+
+        os.utime( mPath )
+        return FeatureStore( mPath )
+
+
+    def insert( self, key, featureExtractor ):
+        '''
+        Store extracted features under a cache key and evict old entries
+        @param featureExtractor: FeatureExtractor w/ extracted, filtered data
+        '''
+        featureExtractor.writeFeatureStore( self.storePath( key ) )
+        self.evict( keep=key )
+
+
+    def evict( self, keep=None ):
+        '''
+        Remove least recently used entries until the cache fits its size cap
+        @param keep: key of an entry which is never evicted
+        '''
+        mEntries = list()
+        nBytes = 0
+        for name in os.listdir( self.cacheDir ):
+            if not name.endswith( '.npy' ):
+                continue
+            mPath = os.path.join( self.cacheDir, name )
+            mSize = os.path.getsize( mPath )
+            if os.path.isfile( mPath + '.features' ):
+                mSize += os.path.getsize( mPath + '.features' )
+            mEntries.append( ( os.path.getmtime( mPath ), mPath, mSize ) )
+            nBytes += mSize
+
+        # Oldest first
+        for mtime, mPath, mSize in sorted( mEntries ):
+            if nBytes <= self.maxBytes:
+                break
+            if keep is not None and mPath == self.storePath( keep ):
+                continue
+
+            # Remove the features file first so the entry reads as a miss
+            if os.path.isfile( mPath + '.features' ):
+                os.remove( mPath + '.features' )
+            os.remove( mPath )
+            nBytes -= mSize
@@ -2,8 +2,18 @@
 
 from abc import ABCMeta, abstractmethod
 from inputReader import InputReader
+from featureSchema import FeatureSchema
+from columnStats import ColumnStats
+from multiprocessing import Pool
 import numpy as np
 import csv
+import collections
+import queue
+import threading
+
+# Default dtype of extracted training data - float32 halves the memory of 
+# float64 and still holds the enumeration codes and label exactly
+featureDtype = np.float32
 
 
 class FeatureExtractor( metaclass=ABCMeta ):
@@ -13,29 +23,80 @@ class FeatureExtractor( metaclass=ABCMeta ):
     and getTrainingData() appropriately for the given input source.
     '''
 
-    def __init__( self, mInputReader , filterPath='../res/FeatureFilter' ):
+    def __init__( self, mInputReader , filterPath='../res/FeatureFilter',
+                  chunkSize=None, columnar=False, dtype=featureDtype ):
         '''
         Constructor - arguments passed from main
-        @param mInputReader: InputReader object for setting raw data
+        @param mInputReader: InputReader object for setting raw data, or None
+        for an extractor of already extracted data, see fromData()
+        @param chunkSize: if set, stream the input in blocks of this many rows
+        via genFeatureChunks() instead of reading the whole file up front
+        @param columnar: if set, read the input as typed per-feature columns
+        into the columns member instead of a string training data matrix
+        @param dtype: numpy dtype of the extracted training data
         '''
+        assert( chunkSize is None or not columnar )
         # Feature dump and filter path
         self.outCSVPath = '../../tmp/featureDump.csv'
         self.filterCSVPath = filterPath
 
-        # Get raw data from the passed InputReader
-        mInputReader.readFile()
-        self.rawData = mInputReader.getRawData()
+        # Keep the reader and chunk size around for chunked extraction
+        self.inputReader = mInputReader
+        self.chunkSize = chunkSize
 
-        # Initialize feature set and training data from raw data
-        self.features = self.rawData[0]
-        self.trainingData = np.array( self.rawData[1:] )
-        
-        # Construct the InputReader used for feature filtering
-        self.filterReader = InputReader( self.filterCSVPath )
+        # Construct the InputReader used for feature filtering, if any, and 
+        # read the filter list once.  Push the filter down so filtered 
+        # columns are never parsed or stored
+        self.filterReader = None
+        if self.filterCSVPath is not None:
+            self.filterReader = InputReader( self.filterCSVPath )
+        self.filterList = self.readFilterList()
+        if mInputReader is not None:
+            mInputReader.setColumnFilter( self.filterList )
+
+        # Typed per-feature columns, only populated in columnar mode
+        self.columns = None
+
+        if mInputReader is None:
+            # Nothing to read, the features and data are set by the caller
+            self.rawData = list()
+            self.features = list()
+            self.trainingData = np.array( [] )
+        elif columnar:
+            # Training data is assembled from the columns during extraction
+            self.rawData = list()
+            self.features, self.columns = mInputReader.readColumns()
+            self.trainingData = np.array( [] )
+        elif self.chunkSize is None:
+            # Get raw data from the passed InputReader
+            mInputReader.readFile()
+            self.rawData = mInputReader.getRawData()
+
+            # Initialize feature set and training data from raw data
+            self.features = self.rawData[0]
+            self.trainingData = np.array( self.rawData[1:] )
+        else:
+            # Only the header is read now, samples arrive per chunk
+            self.rawData = list()
+            self.features = mInputReader.readHeader()
+            self.trainingData = np.array( [] )
 
         # Initialize number of samples removed
         self.nRmvSamples = 0
 
+        # Training data dtype once extracted
+        self.dtype = np.dtype( dtype )
+
+        # Feature conversions, populated by implementation classes
+        self.featureConvLookup = dict()
+
+        # Compiled feature schema, see getSchema()
+        self.schema = None
+
+        # Per column statistics of the extracted training data, accumulated
+        # by the extraction pass, see getColumnStats()
+        self.columnStats = None
+
 
     def setOutCSVPath( self , fPath ):
         '''@param fPath: relative location and name of feature dump CSV'''
@@ -58,9 +119,20 @@ class FeatureExtractor( metaclass=ABCMeta ):
     def setTrainingData( self, data ):
         assert( isinstance( data, np.ndarray ) )
         self.trainingData = data
+        self.columnStats = None
+
+
+    def getColumnStats( self ):
+        '''
+        @return stats: ColumnStats of the training data, or None if not 
+        accumulated during extraction
+        '''
+        return self.columnStats
 
     
     def getSampleCnt( self ):
+        if self.columns is not None:
+            return len( self.columns[self.features[0]] )
         return len( self.trainingData )
 
 
@@ -74,29 +146,54 @@ class FeatureExtractor( metaclass=ABCMeta ):
         @param feature: training feature
         @return index: index of passed feature
         '''
-        return self.features.index( feature )
+        return self.getSchema().index( feature )
+
+
+    def getSchema( self ):
+        '''
+        Return the compiled FeatureSchema of the current features, compiling
+        it again if the feature list has been replaced
+        '''
+        if self.schema is None or self.schema.features is not self.features:
+            self.schema = FeatureSchema( self.features, self.filterList,
+                                         self.featureConvLookup )
+        return self.schema
+
+
+    def readFilterList( self ):
+        '''@return filterList: features listed in the filter resource'''
+        if self.filterReader is None:
+            return list()
+
+        try:
+            self.filterReader.readFile()
+        except AttributeError:
+            # Filter resource couldn't be opened, nothing to filter
+            return list()
+
+        mFilterData = self.filterReader.getRawData()
+        return mFilterData[0] if mFilterData else list()
         
 
     def applyFeatureFilter( self ):
         ''' 
-        Reads the filter resource file and accordingly removes the feature
-        from each sample.
+        Removes the features listed in the filter resource from each sample,
+        projecting the training data onto the remaining columns in one pass.
+        Features read through the InputReader are already filtered at read
+        time, so this only has work to do if the features were replaced.
         '''
-        # Read out the resource content
-        self.filterReader.readFile()
+        mSchema = self.getSchema()
 
-        # Stash the results to a local list
-        mFilterList = self.filterReader.getRawData()[0]
-        
-        # Use our list index method to find appropriate column in feature 
-        # list to remove
-        for feature in mFilterList:
-            try:
-                idx = self.listIdx( feature )
-                del self.features[idx]
-                self.trainingData = np.delete( self.trainingData, idx, 1 )
-            except ValueError:
-                print( 'Unable to remove feature %s!' % feature )
+        # Nothing to drop, leave the training data untouched
+        if len( mSchema.keepIdx ) == len( mSchema ):
+            return
+
+        # Keep the remaining columns and switch to their schema
+        self.trainingData = self.trainingData[:, mSchema.keepIdx]
+        if self.columnStats is not None:
+            self.columnStats = self.columnStats.project( mSchema.keepIdx )
+        self.schema = mSchema.project()
+        self.features = self.schema.features
     
 
     def writeFeaturesToCSV( self ):
@@ -118,12 +215,396 @@ class FeatureExtractor( metaclass=ABCMeta ):
         mDumpFile.close()
 
 
+    def writeFeatureStore( self, fPath ):
+        ''' 
+        Dump the transformed data to a binary feature store for later runs,
+        see FeatureStore.  The training data is written as a raw .npy array
+        at fPath, and the features as a one row CSV at fPath + '.features'.
+        Note: This shouldn't be called w/o extracting features from a 
+        derived class first.
+        @param fPath: location and name of the feature store
+        '''
+        # Log status - TODO: move this to a logging class
+        print( 'Writing feature store %s..' % fPath )
+
+        np.save( fPath, np.asarray( self.trainingData, dtype=self.dtype ), 
+                 allow_pickle=False )
+
+        with open( fPath + '.features', 'w', newline='' ) as f:
+            csv.writer( f, delimiter=',' ).writerow( self.features )
+
+
+    def genFeatureChunks( self ):
+        '''
+        Generator for chunked mode - loads each block of rows from the 
+        InputReader as the training data, runs extractFeatures() on it and
+        yields the converted block.  Feature filtering is not applied.
+        @return chunk: extracted training data for one block of rows
+        '''
+        assert( self.chunkSize is not None )
+
+        # Tally removed samples and column statistics across all chunks
+        nRmvSamples = 0
+        mStats = ColumnStats( nFeatures=len( self.features ) )
+
+        for chunk in self.inputReader.readChunks( self.chunkSize ):
+            self.trainingData = chunk
+            self.extractFeatures()
+            nRmvSamples += self.nRmvSamples
+            if self.columnStats is not None:
+                mStats.merge( self.columnStats )
+            yield self.trainingData
+
+        self.nRmvSamples = nRmvSamples
+        self.columnStats = mStats
+
+
+    def rewind( self ):
+        '''
+        Chunked mode - restart the input, so genFeatureChunks() makes another
+        pass over it from the first block
+        '''
+        assert( self.chunkSize is not None )
+        self.inputReader.rewind()
+        self.inputReader.readHeader()
+
+
+    def runPipeline( self, dumpPath=None, storePath=None, nJobs=1, 
+                     queueSize=4 ):
+        '''
+        Streaming mode - a reader thread fills a bounded queue w/ blocks of 
+        rows, the blocks are extracted (in a pool of worker processes if nJobs
+        is set) and a writer thread appends them to the CSV dump and/or the
+        binary feature store.  Disk reads, conversion and writes overlap, and
+        only a few blocks are held in memory at any time.
+        @param dumpPath: location of the CSV dump, see writeFeaturesToCSV()
+        @param storePath: location of the feature store, see 
+        writeFeatureStore()
+        @param nJobs: number of worker processes, 1 extracts in this process
+        @param queueSize: maximum number of blocks waiting at each stage
+        @return nSamples: number of samples written
+        '''
+        assert( self.chunkSize is not None )
+
+        # Log status - TODO: move this to a logging class
+        print( 'Running pipeline in blocks of %d rows..' % self.chunkSize )
+
+        mReadQueue = queue.Queue( queueSize )
+        mWriteQueue = queue.Queue( queueSize )
+        mErrors = list()
+
+        # Start the read and write stages, daemons so a failure can't hang
+        mReader = threading.Thread( target=self.__readStage, 
+                                    args=( mReadQueue, ), daemon=True )
+        mWriter = threading.Thread( target=self.__writeStage,
+                                    args=( mWriteQueue, dumpPath, storePath,
+                                           mErrors ), daemon=True )
+        mReader.start()
+        mWriter.start()
+
+        nSamples = 0
+        nRmvSamples = 0
+        mStatsList = list()
+        try:
+            for data, n, stats in self.__extractStage( mReadQueue, nJobs ):
+                nSamples += len( data )
+                nRmvSamples += n
+                mStatsList.append( stats )
+                mWriteQueue.put( data )
+        finally:
+            # Flush the writer, then surface any error raised while writing
+            mWriteQueue.put( None )
+            mWriter.join()
+
+        if mErrors:
+            raise mErrors[0]
+
+        # Release the last block, samples now only live in the outputs
+        self.trainingData = np.array( [] )
+        self.nRmvSamples = nRmvSamples
+        self.columnStats = self.mergeStats( mStatsList )
+
+        # Log status - TODO: move this to a logging class
+        print( 'Removed = %d of %d input samples' % ( nRmvSamples, 
+                                                      nSamples + nRmvSamples ) )
+
+        return nSamples
+
+
+    def __readStage( self, mReadQueue ):
+        '''Pipeline reader thread - queue each block of rows, then None'''
+        try:
+            for chunk in self.inputReader.readChunks( self.chunkSize ):
+                mReadQueue.put( chunk )
+        except BaseException as e:
+            mReadQueue.put( e )
+            return
+        mReadQueue.put( None )
+
+
+    def __extractStage( self, mReadQueue, nJobs ):
+        '''
+        Generator over the extracted blocks, in read order
+        @return data, nRmvSamples, stats: extracted block, its removed sample
+        count and column statistics
+        '''
+        if nJobs <= 1:
+            for chunk in self.__queued( mReadQueue ):
+                yield extractShard( ( self, chunk ) )
+            return
+
+        with Pool( nJobs ) as pool:
+            # Bound the blocks in flight to one waiting per worker
+            mPending = collections.deque()
+            for chunk in self.__queued( mReadQueue ):
+                mPending.append( pool.apply_async( extractShard, 
+                                                   ( ( self, chunk ), ) ) )
+                if len( mPending ) > nJobs:
+                    yield mPending.popleft().get()
+
+            while mPending:
+                yield mPending.popleft().get()
+
+
+    def __queued( self, mQueue ):
+        '''
+        Generator over the blocks queued by another stage, until None is 
+        queued.  An exception queued in place of a block is raised.
+        '''
+        while True:
+            block = mQueue.get()
+            if block is None:
+                return
+            if isinstance( block, BaseException ):
+                raise block
+            yield block
+
+
+    def __writeStage( self, mWriteQueue, dumpPath, storePath, mErrors ):
+        '''
+        Pipeline writer thread - append each extracted block to the outputs
+        until None is queued.  Errors are left in mErrors, and the queue is 
+        still drained so the pipeline can't block on a full queue.
+        '''
+        mDumpFile = None
+        mStoreFile = None
+        try:
+            nFeatures = len( self.features )
+            if dumpPath is not None:
+                mDumpFile = open( dumpPath, 'w', newline='' )
+                mCSVWriter = csv.writer( mDumpFile, delimiter=',' )
+                mCSVWriter.writerow( self.features )
+
+            if storePath is not None:
+                # Write the .npy header for zero rows, the row count is filled
+                # in once known.  The header keeps its length as the count
+                # grows, so it can be rewritten in place.
+                mStoreFile = open( storePath, 'wb' )
+                mHeader = {'descr': np.lib.format.dtype_to_descr( 
+                               self.dtype ), 
+                           'fortran_order': False, 'shape': ( 0, nFeatures )}
+                np.lib.format.write_array_header_1_0( mStoreFile, mHeader )
+                nDataStart = mStoreFile.tell()
+
+                with open( storePath + '.features', 'w', newline='' ) as f:
+                    csv.writer( f, delimiter=',' ).writerow( self.features )
+
+            nSamples = 0
+            for data in self.__queued( mWriteQueue ):
+                if mDumpFile is not None:
+                    mCSVWriter.writerows( data )
+                if mStoreFile is not None and len( data ):
+                    mStoreFile.write( np.ascontiguousarray( 
+                        data, dtype=self.dtype ).tobytes() )
+                nSamples += len( data )
+
+            if mStoreFile is not None:
+                mHeader['shape'] = ( nSamples, nFeatures )
+                mStoreFile.seek( 0 )
+                np.lib.format.write_array_header_1_0( mStoreFile, mHeader )
+                assert( mStoreFile.tell() == nDataStart )
+        except BaseException as e:
+            mErrors.append( e )
+            for data in self.__queued( mWriteQueue ):
+                pass
+        finally:
+            for f in [mDumpFile, mStoreFile]:
+                if f is not None:
+                    f.close()
+
+
+    def extractFeaturesParallel( self, nJobs ):
+        '''
+        Run extractFeatures() over row shards of the training data in a pool
+        of worker processes, then merge the converted shards back in their
+        original order.  The result matches a serial extractFeatures() call.
+        @param nJobs: number of worker processes, 1 runs serially
+        '''
+        if nJobs <= 1:
+            self.extractFeatures()
+            return
+
+        # Split the rows (or each column in columnar mode) into shards
+        nSamples = self.getSampleCnt()
+        mBounds = np.linspace( 0, nSamples, nJobs + 1 ).astype( int )
+        if self.columns is not None:
+            mShards = [{feature: col[mBounds[i]:mBounds[i + 1]]
+                        for feature, col in self.columns.items()}
+                       for i in range( nJobs )]
+        else:
+            mShards = [self.trainingData[mBounds[i]:mBounds[i + 1]]
+                       for i in range( nJobs )]
+
+        # Log status - TODO: move this to a logging class
+        print( 'Preprocessing the data in %d processes..' % nJobs )
+
+        with Pool( nJobs ) as pool:
+            mResults = pool.map( extractShard, 
+                                 [( self, shard ) for shard in mShards] )
+
+        # Merge the shards, their removed sample counts and statistics
+        self.trainingData = np.concatenate( [r[0] for r in mResults] )
+        self.nRmvSamples = sum( [r[1] for r in mResults] )
+        self.columnStats = self.mergeStats( [r[2] for r in mResults] )
+        self.columns = None
+
+        # Log status - TODO: move this to a logging class
+        print( 'Removed = %d of %d input samples' % ( self.nRmvSamples, 
+                                                      nSamples ) )
+
+
+    @classmethod
+    def extractFiles( cls, fPaths, filterPath, nJobs=1, dtype=featureDtype ):
+        '''
+        Read, extract and filter several input files, one worker process per
+        file, and concatenate the results in the order given.  All files must
+        share the same header.
+        @param fPaths: list of input resource locations
+        @param filterPath: relative location and name of feature filter CSV
+        @param nJobs: number of worker processes, 1 runs serially
+        @param dtype: numpy dtype of the extracted training data
+        @return featureExtractor: extractor holding the combined data
+        '''
+        mArgs = [( cls, fPath, filterPath, dtype ) for fPath in fPaths]
+
+        if nJobs <= 1:
+            mResults = [extractFile( args ) for args in mArgs]
+        else:
+            with Pool( min( nJobs, len( fPaths ) ) ) as pool:
+                mResults = pool.map( extractFile, mArgs )
+
+        # Every file must produce the same features as the first
+        for fPath, ( features, data, n, stats ) in zip( fPaths, mResults ):
+            if features != mResults[0][0]:
+                raise ValueError( 'Header of %s does not match %s' % 
+                                  ( fPath, fPaths[0] ) )
+
+        # Combine the extracted files w/o reading any input again
+        mFeatureExtractor = cls.fromData( 
+            mResults[0][0], np.concatenate( [r[1] for r in mResults] ),
+            filterPath, dtype )
+        mFeatureExtractor.nRmvSamples = sum( [r[2] for r in mResults] )
+        mFeatureExtractor.columnStats = cls.mergeStats( 
+            [r[3] for r in mResults] )
+
+        # Log status - TODO: move this to a logging class
+        print( 'Combined %d samples from %d files' % ( 
+            mFeatureExtractor.getSampleCnt(), len( fPaths ) ) )
+
+        return mFeatureExtractor
+
+
+    @classmethod
+    def fromData( cls, features, data, filterPath=None, dtype=featureDtype ):
+        '''
+        Construct an extractor holding already extracted samples, w/o an
+        input to read
+        @param features: extracted feature list
+        @param data: extracted training data, one column per feature
+        @param filterPath: relative location and name of feature filter CSV
+        @param dtype: numpy dtype of the extracted training data
+        @return featureExtractor: extractor holding the samples
+        '''
+        mFeatureExtractor = cls( None, filterPath, dtype=dtype )
+        mFeatureExtractor.features = features
+        mFeatureExtractor.trainingData = data
+        return mFeatureExtractor
+
+
+    @staticmethod
+    def mergeStats( mStatsList ):
+        '''
+        @param mStatsList: ColumnStats of each block of samples, None where
+        not accumulated
+        @return stats: ColumnStats of all the blocks, or None if there are
+        no blocks or any block has none
+        '''
+        if not mStatsList or any( stats is None for stats in mStatsList ):
+            return None
+
+        mStats = ColumnStats( nFeatures=len( mStatsList[0] ) )
+        for stats in mStatsList:
+            mStats.merge( stats )
+        return mStats
+
+
     @abstractmethod
     def extractFeatures( self ):
         ''' This method is to be implemented by subclasses'''
         pass
 
 
+    def __getstate__( self ):
+        '''Pickle w/o the readers or any data, for shipping to workers'''
+        state = self.__dict__.copy()
+        for key in ['inputReader', 'filterReader', 'rawData', 'trainingData',
+                    'columns', 'columnStats']:
+            state[key] = None
+        return state
+
+
     def __del__( self ):
         '''No Destructor implementation'''
         pass
+
+
+def extractShard( args ):
+    '''
+    Worker process entry for extractFeaturesParallel()
+    @param args: tuple of FeatureExtractor and its shard of the rows, or of
+    the columns in columnar mode
+    @return data, nRmvSamples, stats: converted shard, its removed sample
+    count and column statistics
+    '''
+    mFeatureExtractor, shard = args
+
+    if isinstance( shard, dict ):
+        mFeatureExtractor.columns = shard
+    else:
+        mFeatureExtractor.trainingData = shard
+
+    mFeatureExtractor.extractFeatures()
+
+    return ( mFeatureExtractor.getTrainingData(), 
+             mFeatureExtractor.getRmvSampleCnt(),
+             mFeatureExtractor.getColumnStats() )
+
+
+def extractFile( args ):
+    '''
+    Worker process entry for FeatureExtractor.extractFiles()
+    @param args: tuple of FeatureExtractor implementation class, input 
+    resource location, feature filter location and training data dtype
+    @return features, data, nRmvSamples, stats: extracted file, its
+    removed sample count and column statistics
+    '''
+    cls, fPath, filterPath, dtype = args
+
+    mFeatureExtractor = cls( InputReader( fPath ), filterPath, dtype=dtype )
+    mFeatureExtractor.extractFeatures()
+    mFeatureExtractor.applyFeatureFilter()
+
+    return ( mFeatureExtractor.getFeatures(), 
+             mFeatureExtractor.getTrainingData(),
+             mFeatureExtractor.getRmvSampleCnt(),
+             mFeatureExtractor.getColumnStats() )
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+class FeatureSchema:
+    '''
+    Compiled layout of the training features.  Built once from the header
+    row, the feature filter list and an extractor's conversion lookup, so
+    feature indices and conversions are resolved up front rather than per
+    sample.
+    '''
+
+    def __init__( self, features, filterList=None, convLookup=None,
+                  label='loan_status' ):
+        '''
+        Constructor
+        @param features: ordered list of feature names, e.g. the header row
+        @param filterList: features to be removed by the feature filter
+        @param convLookup: dictionary of feature name to conversion
+        @param label: name of the classification output feature
+        '''
+        self.features = features
+        self.label = label
+
+        # Name to column index map
+        self.featureIdx = {feature: i for i, feature in enumerate( features )}
+
+        # Conversion plan - the conversion of each column in order, None for
+        # columns which only need parsing as numbers
+        if convLookup is None:
+            convLookup = dict()
+        self.convLookup = convLookup
+        self.convPlan = [convLookup.get( feature ) for feature in features]
+
+        # Columns surviving the feature filter, in order
+        if filterList is None:
+            filterList = list()
+        self.filterList = filterList
+        self.keepIdx = [i for i, feature in enumerate( features )
+                        if feature not in self.filterList]
+
+        # Column index of the classification output, if present
+        self.labelIdx = self.featureIdx.get( label )
+
+
+    def index( self, feature ):
+        '''
+        Return the column index of a given feature
+        @param feature: feature name
+        @return index: column index, raises ValueError if not present
+        '''
+        try:
+            return self.featureIdx[feature]
+        except KeyError:
+            raise ValueError( '%s is not a feature' % feature )
+
+
+    def project( self ):
+        '''
+        @return schema: FeatureSchema of the features remaining once the
+        filter list has been applied
+        '''
+        return FeatureSchema( [self.features[i] for i in self.keepIdx],
+                              None, self.convLookup, self.label )
+
+
+    def __len__( self ):
+        return len( self.features )
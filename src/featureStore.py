@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from inputReader import InputReader
+from featureExtractor import FeatureExtractor
+import numpy as np
+
+class FeatureStore( FeatureExtractor ):
+    ''' 
+    FeatureExtractor implementation backed by a binary feature store written
+    by FeatureExtractor.writeFeatureStore().  The training data is memory 
+    mapped rather than read, so no CSV parsing or extraction is repeated and
+    samples are only paged in as they are used.
+    '''
+
+    def __init__( self , storePath, filterPath=None ):
+        '''
+        @param storePath: location and name of the feature store
+        @param filterPath: optional feature filter applied on top of the 
+        stored features
+        '''
+
+        # The features are read from the store's header CSV
+        super().__init__( InputReader( storePath + '.features' ), filterPath )
+
+        # Stored columns can't be dropped at read time, so take the full
+        # feature list back and leave filtering to applyFeatureFilter()
+        self.features = InputReader( storePath + '.features' ).readHeader()
+
+        # Map the stored training data read only
+        self.trainingData = np.load( storePath, mmap_mode='r', 
+                                     allow_pickle=False )
+        assert( self.trainingData.shape[1] == len( self.features ) )
+
+        # Keep the dtype the store was written w/
+        self.dtype = self.trainingData.dtype
+
+
+    def extractFeatures( self ):
+        '''Stored features are already extracted, nothing to do'''
+        pass
+
+    def __del__( self ):
+        pass
@@ -1,5 +1,140 @@
 #!/usr/bin/python3
+import numpy as np
 import csv
+import io
+import gzip
+import bz2
+import lzma
+import zipfile
+import glob
+import mmap
+from multiprocessing import Pool
+
+# Leading magic bytes of the compressed formats read transparently
+compressedMagic = [( b'\x1f\x8b', gzip.open ), 
+                   ( b'BZh', bz2.open ),
+                   ( b'\xfd7zXZ\x00', lzma.open )]
+zipMagic = b'PK\x03\x04'
+
+
+def expandInputPaths( patterns ):
+    '''
+    Expand input file names and glob patterns to a list of files
+    @param patterns: list of file names and/or glob patterns
+    @return fPaths: sorted matches of each pattern, in pattern order.  A 
+    pattern w/o matches is kept as is so opening it reports the missing file.
+    '''
+    fPaths = list()
+    for pattern in patterns:
+        matches = sorted( glob.glob( pattern ) )
+        for fPath in ( matches if matches else [pattern] ):
+            if fPath not in fPaths:
+                fPaths.append( fPath )
+    return fPaths
+
+def recordRanges( fPath, nRanges ):
+    '''
+    Split a CSV file into byte ranges aligned to record boundaries, for 
+    parsing the ranges independently.  A newline only ends a record when an
+    even number of quote characters precede it, so newlines within quoted
+    fields never split a record.
+    @param fPath: relative location and name of an uncompressed CSV file
+    @param nRanges: number of ranges wanted, fewer are returned for small files
+    @return ranges: list of ( start, end ) byte offsets of the body records in
+    file order, the header record is not included
+    '''
+    with open( fPath, 'rb' ) as f:
+        if not f.seek( 0, io.SEEK_END ):
+            return list()
+        mm = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+
+    # The body starts after the header record
+    start, nQuotes = recordBoundary( mm, 0, 0 )
+    bounds = [start]
+
+    # Move each evenly spaced offset forward to the next record boundary
+    for k in range( 1, nRanges ):
+        target = start + k * ( len( mm ) - start ) // nRanges
+        if target <= bounds[-1]:
+            continue
+        nQuotes += mm[bounds[-1]:target].count( b'"' )
+        bound, nQuotes = recordBoundary( mm, target, nQuotes )
+        if bound >= len( mm ):
+            break
+        bounds.append( bound )
+
+    bounds.append( len( mm ) )
+    mm.close()
+
+    return [( bounds[i], bounds[i + 1] ) for i in range( len( bounds ) - 1 )
+            if bounds[i] < bounds[i + 1]]
+
+
+def recordBoundary( mm, pos, nQuotes ):
+    '''
+    Locate the first record boundary at or after a byte offset
+    @param mm: mapped file contents
+    @param pos: byte offset to search from
+    @param nQuotes: number of quote characters before pos
+    @return bound, nQuotes: offset following the record ending newline, or the
+    file size if there is none, and the number of quote characters before it
+    '''
+    while True:
+        newline = mm.find( b'\n', pos )
+        if newline < 0:
+            return len( mm ), nQuotes + mm[pos:].count( b'"' )
+
+        nQuotes += mm[pos:newline].count( b'"' )
+        pos = newline + 1
+        if nQuotes % 2 == 0:
+            return pos, nQuotes
+
+
+def parseRange( args ):
+    '''
+    Worker - parse, filter and project the records in one byte range of a CSV
+    @param args: tuple of file path, start and end offsets, kept column 
+    indices, row filter column index, row filter predicate and columnar flag
+    @return block, nSkipped: list of kept rows, or list of per column string
+    arrays if columnar is set, and number of rows filtered out
+    '''
+    fPath, start, end, keepIdx, filterIdx, predicate, columnar = args
+
+    with open( fPath, 'rb' ) as f:
+        f.seek( start )
+        data = f.read( end - start )
+
+    # Decode as the serial reader would, universal newlines included
+    reader = csv.reader( io.TextIOWrapper( io.BytesIO( data ) ), 
+                         delimiter=',' )
+
+    rows = list()
+    nSkipped = 0
+    for row in reader:
+        if not keepRow( row, filterIdx, predicate ):
+            nSkipped += 1
+            continue
+        rows.append( projectRow( row, keepIdx ) )
+
+    # Column arrays are far cheaper to ship back than lists of strings
+    if columnar:
+        return [np.array( col ) for col in zip( *rows )], nSkipped
+
+    return rows, nSkipped
+
+
+def keepRow( row, filterIdx, predicate ):
+    '''@return keep: False if the row filter rejects the row'''
+    return filterIdx is None or ( filterIdx < len( row ) and 
+                                  predicate( row[filterIdx] ) )
+
+
+def projectRow( row, keepIdx ):
+    '''@return row: the row w/ only the kept columns, if any were dropped'''
+    if keepIdx is None:
+        return row
+    return [row[i] for i in keepIdx]
+
 
 class InputReader:
     '''
@@ -8,40 +143,358 @@ class InputReader:
     defers any further processing of data to futher classes.
     '''
 
-    def __init__( self, fPath ):
+    def __init__( self, fPath, nJobs=1 ):
         ''' 
         Constructor - arguments passed from main
         @param fPath: relative location and name of input resource
+        @param nJobs: number of processes parsing the body of an uncompressed
+        input, split into byte ranges at record boundaries
         '''
         self.__inputFilePath = fPath
+        self.__nJobs = nJobs
+        self.__compressed = False
         self.__rawData = list()
+        self.__header = None
+
+        # Features excluded at read time and the column indices kept
+        self.__excluded = list()
+        self.__keepIdx = None
+
+        # Read time row predicate, its column index and skipped row count
+        self.__rowFilter = None
+        self.__rowFilterIdx = None
+        self.__nSkipped = 0
         
         # Attempt to access requested file
         try:
-            self.__inputFile = open( self.__inputFilePath, 'r' )
+            self.__inputFile = self.openInput( self.__inputFilePath )
             self.__reader = csv.reader( self.__inputFile, delimiter=',' )   
         except FileNotFoundError:
             print( "Couldn't open input file %s" % self.__inputFilePath )
             return
                                                         
+    def rewind( self ):
+        '''
+        Reopen the input resource so it can be read again from the header, 
+        keeping the column and row filters
+        '''
+        try:
+            self.__inputFile.close()
+        except AttributeError:
+            pass
+
+        self.__inputFile = self.openInput( self.__inputFilePath )
+        self.__reader = csv.reader( self.__inputFile, delimiter=',' )
+        self.__rawData = list()
+        self.__header = None
+        self.__keepIdx = None
+        self.__rowFilterIdx = None
+        self.__nSkipped = 0
+
     def setFilePath( self, fPath ):
         '''@param fPath: relative location and name of input resource'''
         self.__inputFilePath = fPath
 
+    def openInput( self, fPath ):
+        '''
+        Open the input resource as text.  gzip, bz2, xz and single file zip
+        archives are recognized by their magic bytes and decompressed as they
+        are read, so no intermediate file is needed.
+        @param fPath: relative location and name of input resource
+        @return file: text file object
+        '''
+        with open( fPath, 'rb' ) as f:
+            magic = f.read( 6 )
+
+        for mMagic, mOpen in compressedMagic:
+            if magic.startswith( mMagic ):
+                self.__compressed = True
+                return mOpen( fPath, 'rt' )
+
+        if magic.startswith( zipMagic ):
+            self.__compressed = True
+
+            # LendingClub archives hold a single CSV, read the first file
+            mArchive = zipfile.ZipFile( fPath )
+            mMembers = [m for m in mArchive.namelist() if not m.endswith( '/' )]
+            return io.TextIOWrapper( mArchive.open( mMembers[0] ) )
+
+        return open( fPath, 'r' )
+
+    def setColumnFilter( self, excluded ):
+        '''
+        Exclude features at read time, so their columns are never parsed or
+        stored.  Must be set before anything is read.
+        @param excluded: list of feature names to drop
+        '''
+        assert( self.__header is None )
+        self.__excluded = excluded
+
+    def setRowFilter( self, feature, predicate ):
+        '''
+        Skip samples at read time, so they are never stored or converted.
+        Must be set before anything is read.
+        @param feature: name of the feature the predicate is applied to
+        @param predicate: function of a row's feature entry, the row is kept
+        only if it returns True
+        '''
+        assert( self.__header is None )
+        self.__rowFilter = ( feature, predicate )
+
     def readFile( self ):
 
         # Log status - TODO: move this to a logging class
         print( 'Reading input file..' )
 
-        for row in self.__reader:
+        # Header leads the raw data, unless it was already handed out
+        if self.__header is None:
+            header = self.readHeader()
+            if header:
+                self.__rawData.append( header )
+
+        for row in self.__rows():
             self.__rawData.append( row )
 
+    def readHeader( self ):
+        '''
+        Read the header row only, leaving the reader positioned at the first
+        sample so the body can be streamed with readChunks()
+        @return header: list of feature names, less any excluded features
+        '''
+        if self.__header is None:
+            header = next( self.__reader, list() )
+
+            # Locate the row filter's column before any are dropped
+            if self.__rowFilter is not None:
+                if self.__rowFilter[0] in header:
+                    self.__rowFilterIdx = header.index( self.__rowFilter[0] )
+                else:
+                    print( 'Unable to filter rows by feature %s!' % 
+                           self.__rowFilter[0] )
+
+            # Work out which columns survive the column filter
+            if self.__excluded:
+                for feature in self.__excluded:
+                    if feature not in header:
+                        print( 'Unable to remove feature %s!' % feature )
+                self.__keepIdx = [i for i, feature in enumerate( header )
+                                  if feature not in self.__excluded]
+
+            self.__header = self.__project( header )
+
+        return self.__header
+
+
+    def readChunks( self, chunkSize=10000 ):
+        '''
+        Generator over the input body in fixed size row blocks, so memory is
+        bounded by the chunk size rather than the file size
+        @param chunkSize: maximum number of rows per block
+        @return chunk: numpy string array of up to chunkSize rows
+        '''
+        # Log status - TODO: move this to a logging class
+        print( 'Reading input file in chunks of %d rows..' % chunkSize )
+
+        for rows in self.__readRowBlocks( chunkSize ):
+            yield np.array( rows )
+
+
+    def readColumns( self, strFeatures=None, chunkSize=10000, encode=True ):
+        '''
+        Columnar read - each column is held in its own array, numeric columns
+        are parsed straight to int/float and only text columns stay strings
+        @param strFeatures: features to keep as strings, every other column is
+        parsed as numeric w/ unparseable cells set to NaN.  If None, a column
+        is kept as strings when any non-empty cell isn't a number.
+        @param chunkSize: number of rows buffered before columns are split out
+        @param encode: hold text columns as EncodedColumn objects
+        @return header, columns: list of feature names and dict of feature name
+        to column array
+        '''
+        # Log status - TODO: move this to a logging class
+        print( 'Reading input file by column..' )
+
+        header = self.readHeader()
+
+        # Split each block of rows into per-column arrays, so every column
+        # is only as wide as its own longest cell
+        mBlocks = [list() for feature in header]
+        if self.__isParallel():
+            # Workers split their byte range into columns themselves
+            for cols in self.__parseRanges( True ):
+                for j, col in enumerate( cols ):
+                    mBlocks[j].append( col )
+        else:
+            for rows in self.__readRowBlocks( chunkSize ):
+                for j, col in enumerate( zip( *rows ) ):
+                    mBlocks[j].append( np.array( col ) )
+
+        columns = dict()
+        for j, feature in enumerate( header ):
+            if mBlocks[j]:
+                col = np.concatenate( mBlocks[j] )
+            else:
+                col = np.array( [], dtype=str )
+            mBlocks[j] = None
+
+            # Keep requested text columns as is, type the rest
+            if strFeatures is None or feature not in strFeatures:
+                numCol = self.parseNumeric( col, strFeatures is None )
+                if numCol is not None:
+                    columns[feature] = numCol
+                    continue
+
+            columns[feature] = EncodedColumn( col ) if encode else col
+
+        return header, columns
+
+
+    def parseNumeric( self, col, strict=False ):
+        '''
+        Parse a string column to an int64 array when every cell is an integer,
+        else to a float64 array w/ NaN in place of unparseable cells
+        @param col: numpy string array
+        @param strict: return None instead if any non-empty cell isn't numeric
+        @return numCol: typed numpy array or None
+        '''
+        try:
+            numCol = col.astype( float )
+        except ValueError:
+            # Fall back to a per cell parse to locate the bad entries
+            numCol = np.empty( len( col ) )
+            for i, cell in enumerate( col ):
+                try:
+                    numCol[i] = float( cell )
+                except ValueError:
+                    if strict and cell.strip():
+                        return None
+                    numCol[i] = np.nan
+
+        # Narrow to integers where nothing is lost
+        if ( np.all( np.isfinite( numCol ) ) and 
+             np.all( numCol == np.floor( numCol ) ) ):
+            return numCol.astype( np.int64 )
+
+        return numCol
+
+
+    def __readRowBlocks( self, chunkSize ):
+        '''Generator over the input body as lists of up to chunkSize rows'''
+        assert( chunkSize > 0 )
+
+        # Make sure the header is not handed out as a sample
+        self.readHeader()
+
+        rows = list()
+        for row in self.__rows():
+            rows.append( row )
+            if len( rows ) == chunkSize:
+                yield rows
+                rows = list()
+
+        # Flush the remaining partial block
+        if rows:
+            yield rows
+
+
+    def __rows( self ):
+        '''Generator over the remaining rows, filtered and projected'''
+        if self.__isParallel():
+            for rows in self.__parseRanges( False ):
+                yield from rows
+            return
+
+        idx = self.__rowFilterIdx
+        predicate = self.__rowFilter[1] if idx is not None else None
+
+        for row in self.__reader:
+            if not keepRow( row, idx, predicate ):
+                self.__nSkipped += 1
+                continue
+
+            yield projectRow( row, self.__keepIdx )
+
+        # Log status - TODO: move this to a logging class
+        if idx is not None:
+            print( 'Skipped %d samples at read time' % self.__nSkipped )
+
+
+    def __isParallel( self ):
+        '''True if the body is to be parsed by byte range in parallel'''
+        return self.__nJobs > 1 and not self.__compressed
+
+
+    def __parseRanges( self, columnar ):
+        '''
+        Generator over the body parsed in parallel byte ranges, in file order
+        @param columnar: yield per column arrays instead of lists of rows
+        '''
+        idx = self.__rowFilterIdx
+        predicate = self.__rowFilter[1] if idx is not None else None
+
+        ranges = recordRanges( self.__inputFilePath, self.__nJobs )
+        args = [( self.__inputFilePath, start, end, self.__keepIdx, idx,
+                  predicate, columnar ) for start, end in ranges]
+
+        with Pool( self.__nJobs ) as mPool:
+            for block, nSkipped in mPool.imap( parseRange, args ):
+                self.__nSkipped += nSkipped
+                if block:
+                    yield block
+
+        # Log status - TODO: move this to a logging class
+        if idx is not None:
+            print( 'Skipped %d samples at read time' % self.__nSkipped )
+
+
+    def __project( self, row ):
+        '''Drop the excluded columns from a row'''
+        return projectRow( row, self.__keepIdx )
+
+
     def getRawData( self ):
         return self.__rawData
 
+
+    def getHeader( self ):
+        return self.__header
+
+
+    def getSkippedCnt( self ):
+        return self.__nSkipped
+
     def __del__( self ):
         ''' Destructor - Close file connection '''
         try:
             self.__inputFile.close()
         except:
             pass
+
+
+class EncodedColumn:
+    '''
+    Dictionary encoded text column - each distinct entry is held once in
+    values, and codes holds each sample's index into values
+    '''
+
+    def __init__( self, col ):
+        '''@param col: numpy string array to encode'''
+        self.values, codes = np.unique( col, return_inverse=True )
+
+        # Narrow the codes to the smallest type able to index the values
+        self.codes = codes.reshape( -1 ).astype( 
+            np.min_scalar_type( max( len( self.values ) - 1, 0 ) ) )
+
+    def decode( self ):
+        '''@return col: numpy string array of the original entries'''
+        return self.values[self.codes]
+
+    def __getitem__( self, idx ):
+        '''Encoded column of the selected samples, sharing the values'''
+        mEncoded = EncodedColumn.__new__( EncodedColumn )
+        mEncoded.values = self.values
+        mEncoded.codes = self.codes[idx]
+        return mEncoded
+
+    def __len__( self ):
+        return len( self.codes )
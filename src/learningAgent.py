@@ -1,9 +1,17 @@
 #!/usr/bin/python3
 
 from abc import ABCMeta, abstractmethod
-from sklearn import preprocessing
+from sklearn import preprocessing, model_selection, base
+from multiprocessing import Pool
+from columnStats import ColumnStats
 import numpy as np
 import pickle
+import tempfile
+import time
+import os
+
+# Label dtype - the class codes are split off into their own small vector
+labelDtype = np.int8
 
 class LearningAgent( metaclass=ABCMeta ):
     ''' 
@@ -13,6 +21,11 @@ class LearningAgent( metaclass=ABCMeta ):
     subclass.
     '''
 
+    # Hyperparameter setters by parameter name, and the parameter values 
+    # tried by searchParams() - extended by implementation classes
+    paramSetters = {'reg': 'setRegularization'}
+    searchGrid = {'reg': [1e-3, 1e-2, 1e-1, 1, 1e1, 1e2, 1e3, 1e4, 1e5]}
+
     def __init__( self, mFeatureExtractor ):
         '''
         Constructor - arguments passed from main
@@ -20,11 +33,16 @@ class LearningAgent( metaclass=ABCMeta ):
         preprocessed training data
         '''
 
-        # Get training data from FeatureExtractor
-        self.trainingData = np.copy( mFeatureExtractor.getTrainingData() )
+        # Get output index from the FeatureExtractor's compiled schema
+        self.schema = mFeatureExtractor.getSchema()
+        self.y_idx = self.schema.labelIdx
+
+        # Reference the training data from the FeatureExtractor rather than
+        # copying it, samples are only gathered once split into subsets
+        self.setTrainingData( mFeatureExtractor.getTrainingData() )
 
-        # Get output index from FeatureExtractor
-        self.y_idx = mFeatureExtractor.listIdx( 'loan_status' )
+        # Column statistics accumulated while extracting, if any
+        self.columnStats = mFeatureExtractor.getColumnStats()
 
         # Set the test fraction to default value
         self.tstFraction = 0.2
@@ -48,25 +66,83 @@ class LearningAgent( metaclass=ABCMeta ):
             fraction = self.tstFraction
 
         # Get sample length and subset boundary
-        nSamples = len( self.trainingData )
+        nSamples = len( self.order )
         tst_idx = nSamples - int( fraction * nSamples )
         
-        # Assign member data based on calculated test index
-        self.X_train = self.trainingData[:tst_idx]
-        self.X_train = np.delete( self.X_train, self.y_idx, 1 )
-        self.y_train = self.trainingData[:tst_idx,self.y_idx]
+        # Split the sample order based on calculated test index, the subset
+        # features are gathered on first use
+        self.trainIdx = self.order[:tst_idx]
+        self.testIdx = self.order[tst_idx:]
+        self.X_train = None
+        self.X_test = None
+
+        self.y_train = self.y[self.trainIdx]
+        self.y_test = self.y[self.testIdx]
+
+
+    @property
+    def X_train( self ):
+        '''Training subset features, gathered on first use'''
+        if self.__X_train is None:
+            self.__X_train = self.gatherSamples( self.trainIdx )
+        return self.__X_train
+
+    @X_train.setter
+    def X_train( self, X ):
+        self.__X_train = X
+
+
+    @property
+    def X_test( self ):
+        '''Test subset features, gathered on first use'''
+        if self.__X_test is None:
+            self.__X_test = self.gatherSamples( self.testIdx )
+        return self.__X_test
+
+    @X_test.setter
+    def X_test( self, X ):
+        self.__X_test = X
+
 
-        self.X_test = self.trainingData[tst_idx:]
-        self.X_test = np.delete( self.X_test, self.y_idx, 1 )
-        self.y_test = self.trainingData[tst_idx:,self.y_idx]
+    def gatherSamples( self, idx ):
+        '''
+        Gather the features of the selected samples in a single copy
+        @param idx: sample indices, in subset order
+        @return X: contiguous samples by feature array, w/o the label column
+        '''
+        return np.asarray( self.trainingData[np.ix_( idx, self.xIdx )] )
+
+
+    def labelVector( self, col ):
+        '''
+        Narrow a label column to labelDtype where nothing is lost
+        @param col: label column of the training data
+        @return y: labelDtype vector, or the column as is if it doesn't only 
+        hold integer class codes in range
+        '''
+        mInfo = np.iinfo( labelDtype )
+        if ( np.all( col == np.floor( col ) ) and 
+             np.all( ( col >= mInfo.min ) & ( col <= mInfo.max ) ) ):
+            return col.astype( labelDtype )
+        return col
 
 
     def standardizeSamples( self ):
         '''Standardize training samples to zero mean and unit deviation'''
 
-        # Create a scaler preprocessing object and pass it our training subset
+        # Create a scaler preprocessing object from the training subset
         # Note: scale data w/ training subset and apply to test subset as well
-        self.scaler = preprocessing.StandardScaler().fit( self.X_train )
+        # The subsets are our own copies, so they are scaled in place
+        if self.columnStats is not None:
+            # The training subset's statistics are those of all samples less
+            # the test subset's, so only the test subset is passed over
+            mStats = self.columnStats.project( self.xIdx )
+            mStats.remove( ColumnStats( self.X_test ) )
+            assert( mStats.count == len( self.X_train ) )
+            self.scaler = mStats.scaler()
+        else:
+            self.scaler = preprocessing.StandardScaler( copy=False ).fit( 
+                self.X_train )
         self.X_train = self.scaler.transform( self.X_train )
         self.X_test = self.scaler.transform( self.X_test )
       
@@ -74,6 +150,44 @@ class LearningAgent( metaclass=ABCMeta ):
         with open( self.scalerPath, 'wb' ) as f:
             pickle.dump( self.scaler, f )
 
+    def updateScaler( self, scaler ):
+        '''
+        Merge the training subset's statistics into a persisted scaler, and 
+        standardize both subsets w/ the merged statistics
+        @param scaler: StandardScaler fitted on earlier training samples
+        @return mean, scale, nSeen: the scaler's statistics and sample count 
+        before the merge
+        '''
+        mean = np.copy( scaler.mean_ )
+        scale = np.copy( scaler.scale_ )
+        nSeen = int( np.max( scaler.n_samples_seen_ ) )
+
+        # Running statistics combine exactly, w/o the earlier samples
+        self.scaler = scaler.partial_fit( self.X_train )
+        self.X_train = self.scaler.transform( self.X_train )
+        self.X_test = self.scaler.transform( self.X_test )
+
+        # Dump the scaler for use by sample predictions
+        with open( self.scalerPath, 'wb' ) as f:
+            pickle.dump( self.scaler, f )
+
+        return mean, scale, nSeen
+
+
+    def rescaleClassifier( self, mean, scale ):
+        '''
+        Re-express the linear classifier, fitted on samples standardized w/
+        the given statistics, in terms of the current scaler so its decisions
+        are unchanged, i.e. w' = w * scale' / scale and 
+        b' = b + sum( w * ( mean' - mean ) / scale )
+        @param mean: per feature mean the classifier was fitted w/
+        @param scale: per feature scale the classifier was fitted w/
+        '''
+        coef = self.clf.coef_ / scale
+        self.clf.intercept_ += np.dot( coef, self.scaler.mean_ - mean )
+        self.clf.coef_[:] = coef * self.scaler.scale_
+
+
     def shuffleSamples( self , seed=None ):
         '''
         Shuffle training sample order
@@ -87,13 +201,179 @@ class LearningAgent( metaclass=ABCMeta ):
         # Use numpy random module for generating random indices
         indices = np.random.permutation( len( self.trainingData) )
 
-        # Shuffle data based on randomly generated indices
-        self.trainingData = self.trainingData[indices]
+        # Shuffle the sample order only, the data itself isn't moved
+        self.order = indices
 
         # Reassign training and test subsets
         self.sampleSlice( self.tstFraction )
     
 
+    def kFoldValidate( self, k=5, nJobs=1, stratified=True ):
+        '''
+        k-fold cross validation over all samples in their current order.  The
+        training part of each fold is standardized, fit w/ a fresh copy of 
+        the classifier, and the held out part scored.  Folds are fit in a pool
+        of worker processes which map the training data read only from a 
+        .npy file, rather than each being sent a copy.
+        Note: implementation classes must hold their estimator in clf
+        @param k: number of folds
+        @param nJobs: number of worker processes, 1 fits the folds in turn
+        @param stratified: keep the label proportions of each fold equal
+        @return scores, fitTimes: per fold accuracy and fit time in seconds
+        '''
+        # Log status - TODO: move this to a logging class
+        print( 'Running %d-fold cross validation in %d processes..' % 
+               ( k, nJobs ) )
+
+        mResults = self.fitFolds( [self.clf], self.foldIndices( k, stratified ),
+                                  nJobs )[0]
+
+        scores = np.array( [score for score, fitTime in mResults] )
+        fitTimes = np.array( [fitTime for score, fitTime in mResults] )
+
+        # Log status - TODO: move this to a logging class
+        for i, ( score, fitTime ) in enumerate( mResults ):
+            print( 'Fold %d accuracy = %0.3f, fit time = %3.2f seconds' % 
+                   ( i, score, fitTime ) )
+        print( '%d-fold cross validation accuracy = %0.3f +/- %0.3f' % 
+               ( k, np.mean( scores ), np.std( scores ) ) )
+
+        return scores, fitTimes
+
+
+    def searchParams( self, grid=None, nIter=None, k=3, nJobs=1, seed=None ):
+        '''
+        Hyperparameter search - each candidate configuration is scored by 
+        k-fold cross validation over the training subset, leaving the test 
+        subset for the final report.  Every fold of every candidate is fit in
+        one pool of worker processes sharing the training data (see 
+        kFoldValidate()).  The agent is left configured w/ the best candidate.
+        @param grid: dictionary of parameter name to list of values, names as
+        in paramSetters.  Defaults to the class searchGrid.
+        @param nIter: number of candidates sampled at random from the grid,
+        if None every combination is tried
+        @param k: number of cross validation folds per candidate
+        @param nJobs: number of worker processes, 1 fits in turn
+        @param seed: random number gen repeatability for random search
+        @return best, results: best parameters and a list of ( parameters, 
+        mean accuracy, total fit time ) per candidate
+        '''
+        if grid is None:
+            grid = self.searchGrid
+
+        if nIter is None:
+            mCandidates = list( model_selection.ParameterGrid( grid ) )
+        else:
+            mCandidates = list( model_selection.ParameterSampler( 
+                grid, nIter, random_state=seed ) )
+
+        # Log status - TODO: move this to a logging class
+        print( 'Searching %d candidates w/ %d-fold cross validation in %d '
+               'processes..' % ( len( mCandidates ), k, nJobs ) )
+
+        # Build an unfitted classifier for each candidate
+        mClfs = list()
+        for params in mCandidates:
+            self.setParams( params )
+            mClfs.append( base.clone( self.clf ) )
+
+        mFoldResults = self.fitFolds( mClfs, 
+                                      self.foldIndices( k, 
+                                                        indices=self.trainIdx ),
+                                      nJobs )
+
+        results = [( params, np.mean( [score for score, t in folds] ),
+                     np.sum( [t for score, t in folds] ) )
+                   for params, folds in zip( mCandidates, mFoldResults )]
+        best = max( results, key=lambda result: result[1] )[0]
+
+        # Log status - TODO: move this to a logging class
+        print( '%-40s %10s %10s' % ( 'Candidate', 'Accuracy', 'Fit time' ) )
+        for params, score, fitTime in results:
+            print( '%-40s %10.3f %9.2fs' % ( params, score, fitTime ) )
+        print( 'Best candidate: %s' % best )
+
+        # Leave the agent configured w/ the best candidate
+        self.setParams( best )
+
+        return best, results
+
+
+    def setParams( self, params ):
+        '''
+        Configure the classifier through the hyperparameter setters
+        @param params: dictionary of parameter name to value, see paramSetters
+        '''
+        for name, value in params.items():
+            getattr( self, self.paramSetters[name] )( value )
+
+
+    def foldIndices( self, k, stratified=True, indices=None ):
+        '''
+        Split the samples, in their current order, into cross validation folds
+        @param k: number of folds
+        @param stratified: keep the label proportions of each fold equal
+        @param indices: samples to split, all samples if None
+        @return folds: list of ( training, test ) sample index arrays
+        '''
+        if indices is None:
+            indices = self.order
+
+        mPositions = np.arange( len( indices ) )
+        if stratified:
+            mFolds = model_selection.StratifiedKFold( k ).split( 
+                mPositions, self.y[indices] )
+        else:
+            mFolds = model_selection.KFold( k ).split( mPositions )
+
+        return [( indices[trn], indices[tst] ) for trn, tst in mFolds]
+
+
+    def fitFolds( self, clfs, folds, nJobs ):
+        '''
+        Fit and score a copy of each classifier on each fold, see fitFold()
+        @param clfs: list of unfitted classifiers
+        @param folds: list of ( training, test ) sample index arrays
+        @param nJobs: number of worker processes, 1 fits in turn
+        @return results: per classifier list of per fold ( accuracy, fit time )
+        '''
+        with tempfile.TemporaryDirectory() as mTmpDir:
+            # Workers share the data through a file mapping
+            mData = self.trainingData
+            if nJobs > 1:
+                mData = self.sharedDataPath( mTmpDir )
+
+            mArgs = [( base.clone( clf ), mData, self.xIdx, self.y, trn, tst )
+                     for clf in clfs for trn, tst in folds]
+
+            if nJobs <= 1:
+                mResults = [fitFold( args ) for args in mArgs]
+            else:
+                with Pool( min( nJobs, len( mArgs ) ) ) as pool:
+                    mResults = pool.map( fitFold, mArgs )
+
+        return [mResults[i:i + len( folds )] 
+                for i in range( 0, len( mResults ), len( folds ) )]
+
+
+    def sharedDataPath( self, tmpDir ):
+        '''
+        Locate the training data as a .npy file workers can map read only
+        @param tmpDir: directory to write the data to if it isn't mapped
+        from a whole .npy file already
+        @return fPath: location of the .npy file
+        '''
+        mData = self.trainingData
+        if isinstance( mData, np.memmap ) and mData.filename is not None:
+            mStored = np.load( mData.filename, mmap_mode='r' )
+            if mStored.shape == mData.shape and mStored.dtype == mData.dtype:
+                return mData.filename
+
+        fPath = os.path.join( tmpDir, 'trainingData.npy' )
+        np.save( fPath, mData, allow_pickle=False )
+        return fPath
+
+
     def setTstFraction( self, fraction ):
         '''Allow for test subset fraction to be set'''
         assert( fraction > 0 and fraction < 1 )
@@ -104,6 +384,17 @@ class LearningAgent( metaclass=ABCMeta ):
         '''Allow for training data to be updated'''
         assert( isinstance( data, np.ndarray ) )
         self.trainingData = data
+        self.columnStats = None
+
+        # Keep the label apart from the feature columns
+        self.y = self.labelVector( data[:, self.y_idx] )
+        self.xIdx = [j for j in range( data.shape[1] ) if j != self.y_idx]
+
+        # Samples in their original order, permuted by shuffleSamples()
+        self.order = np.arange( len( data ) )
+
+        # Initially all samples are for training
+        self.sampleSlice( 0 )
 
 
     def getTrainingData( self ):
@@ -151,3 +442,30 @@ class LearningAgent( metaclass=ABCMeta ):
         '''No Destructor implementation'''
         pass
 
+
+def fitFold( args ):
+    '''
+    Worker process entry for LearningAgent.kFoldValidate()
+    @param args: tuple of unfitted estimator, training data or the location 
+    of it as a .npy file, feature column indices, label vector, and the fold's
+    training and test sample indices
+    @return score, fitTime: fold accuracy and fit time in seconds
+    '''
+    clf, data, xIdx, y, trainIdx, testIdx = args
+
+    if isinstance( data, str ):
+        data = np.load( data, mmap_mode='r' )
+
+    # Gather and standardize the fold's subsets
+    X_train = np.asarray( data[np.ix_( trainIdx, xIdx )] )
+    X_test = np.asarray( data[np.ix_( testIdx, xIdx )] )
+    scaler = preprocessing.StandardScaler( copy=False ).fit( X_train )
+    X_train = scaler.transform( X_train )
+    X_test = scaler.transform( X_test )
+
+    t0 = time.time()
+    clf.fit( X_train, y[trainIdx] )
+    fitTime = time.time() - t0
+
+    return clf.score( X_test, y[testIdx] ), fitTime
+
@@ -2,39 +2,88 @@
 
 import sys
 sys.path.append( '..' )
-from inputReader import InputReader
-from featureExtractor import FeatureExtractor
+from inputReader import InputReader, EncodedColumn
+from featureExtractor import FeatureExtractor, featureDtype
+from columnStats import ColumnStats
 import numpy as np
 import csv
 import re
 from datetime import datetime
 
+# Base value of each sub_grade letter, number subgrade is added on top
+letterGradeDict = {'A': 0, 'B': 5, 'C': 10, 'D': 15, 'E': 20, 'F': 25, 'G': 30}
+
+# Loan purpose enumeration, try to enum from most to least credible and leave
+# slot for others in the middle
+purposeDict = {'car': 9, 'credit_card': 10, 'debt_consolidation': 5, 
+               'education': 4, 'home_improvement': 2, 'house': 1,
+               'major_purchase': 8, 'medical': 3,
+               'small_business': 7, 'vacation': 12, 'wedding': 11}
+
+# State enumeration - TODO: need to determine importance of assigned value to
+# learning algorithm performance
+stateDict = {'AK': 1,  'AL': 2,  'AR': 3,  'AZ': 4,  'CA': 5,  
+             'CO': 6,  'CT': 7,  'DC': 8,  'DE': 9,  'FL': 10, 
+             'GA': 11, 'HI': 12, 'IA': 13, 'ID': 14, 'IL': 15,
+             'IN': 16, 'KS': 17, 'KY': 18, 'LA': 19, 'MA': 20,
+             'MD': 21, 'ME': 22, 'MI': 23, 'MN': 24, 'MO': 25,
+             'MS': 26, 'MT': 27, 'NC': 28, 'ND': 29, 'NE': 30,
+             'NH': 31, 'NJ': 32, 'NM': 33, 'NV': 34, 'NY': 35,
+             'OH': 36, 'OK': 37, 'OR': 38, 'PA': 39, 'PR': 40,
+             'RI': 41, 'SC': 42, 'SD': 43, 'TN': 44, 'TX': 45,
+             'UT': 46, 'VA': 47, 'VI': 48, 'VT': 49, 'WA': 50,
+             'WI': 51, 'WV': 52, 'WY': 53}
+
+# Date formats of the LendingClub date features
+crLineDateFormat = '%m/%d/%Y  %H:%M'
+monthDateFormat = '%b-%Y'
+
 class LendingClubFeatureExtractor( FeatureExtractor ):
     ''' 
     LendingClub implementation of the FeatureExtractor base class
     '''
 
-    def __init__( self , inputReader , filterPath):
-        '''@param inputReader: InputReader object for fetching raw data'''
+    def __init__( self , inputReader , filterPath, chunkSize=None, 
+                  columnar=False, dtype=featureDtype ):
+        '''
+        @param inputReader: InputReader object for fetching raw data, None 
+        for already extracted data, see fromData()
+        @param chunkSize: optional row block size for chunked extraction
+        @param columnar: read the input as typed per-feature columns
+        @param dtype: numpy dtype of the extracted training data
+        '''
+
+        # Skip samples w/o a terminal loan status while reading, they can't
+        # be classified
+        if inputReader is not None:
+            inputReader.setRowFilter( 'loan_status', self.isTerminalStatus )
 
         # Invoke the super's constructor with the InputReader and filterPath
-        super().__init__( inputReader, filterPath )
-
-        # Set the feature conversion dictionary
-        self.featureConvLookup = {'term': self.termConversion,
-                                  'int_rate': self.pcntRemove, 
-                                  'sub_grade': self.loanGradeHash, 
-                                  'emp_length': self.empLengthConversion,
-                                  'home_ownership': 
-                                  self.homeOwnershipEnumerator, 
-                                  'is_inc_v': self.incomeVerifiedConversion, 
-                                  'loan_status': self.statusConversion,
-                                  'purpose': self.purposeEnumerator, 
-                                  'addr_state': self.stateEnumerator, 
-                                  'bc_util': self.pcntRemove, 
-                                  'earliest_cr_line': 
-                                  self.earlyCrLineConversion, 
-                                  'revol_util': self.pcntRemove}
+        super().__init__( inputReader, filterPath, chunkSize, columnar, dtype )
+
+        # Dates are measured against the year of this run
+        self.refYear = datetime.today().year
+
+        # Memo of parsed date entries, shared across columns and chunks
+        self.dateCache = dict()
+
+        # Set the feature conversion dictionary - whole column conversions
+        # used by extractFeatures(), any feature not listed here must parse as
+        # a number
+        self.featureConvLookup = {'term': self.termColumn,
+                                  'int_rate': self.pcntColumn, 
+                                  'sub_grade': self.loanGradeColumn, 
+                                  'emp_length': self.empLengthColumn,
+                                  'home_ownership': self.homeOwnershipColumn, 
+                                  'is_inc_v': self.incomeVerifiedColumn, 
+                                  'loan_status': self.statusColumn,
+                                  'purpose': self.purposeColumn, 
+                                  'addr_state': self.stateColumn, 
+                                  'bc_util': self.pcntColumn, 
+                                  'earliest_cr_line': self.earlyCrLineColumn,
+                                  'issue_d': self.issueDateColumn,
+                                  'last_pymnt_d': self.lastPaymentDateColumn,
+                                  'revol_util': self.pcntColumn}
 
 
     def termConversion( self, training_sample ):
@@ -43,8 +92,14 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of loan term feature
         idx = self.listIdx( 'term' )
         
+        return self.termValue( training_sample[idx] )
+
+
+    def termValue( self, value ):
+        '''Enumerate a single loan term entry'''
+
         # Check expression and convert appropriately
-        if re.search( '36', training_sample[idx] ):
+        if re.search( '36', value ):
             return 36
         else:
             return 60
@@ -56,7 +111,12 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of passed feature
         idx = self.listIdx( feature )
 
-        return float( re.sub( '%', '', training_sample[idx] ) )
+        return self.pcntValue( training_sample[idx] )
+
+
+    def pcntValue( self, value ):
+        '''Remove '%' from a single entry'''
+        return float( re.sub( '%', '', value ) )
 
 
     def loanGradeHash( self, training_sample ):
@@ -65,29 +125,31 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of loan subgrade feature
         idx = self.listIdx( 'sub_grade' )
 
+        return self.loanGradeValue( training_sample[idx] )
+
+
+    def loanGradeValue( self, value ):
+        '''Hash a single A1-G5 subgrade rating to 1 - 35'''
+
         # Search for all possible letter and number grades and modify tmp
         tmp = 0
-        mLetterDict = {'A': 0, 'B': 5, 'C': 10, 'D': 15, 
-                       'E': 20, 'F': 25, 'G': 30}
         
         # Search by letter grade first
-        match = re.search( '[ABCDEFG]', training_sample[idx] )
+        match = re.search( '[ABCDEFG]', value )
         if match:
             key = match.group()
-            tmp = mLetterDict[key]
+            tmp = letterGradeDict[key]
         else:
-            raise ValueError( 'Unexpected value read from sub_grade @ training \
-            sample %d' % idx )
-            return
+            raise ValueError( 'Unexpected value read from sub_grade: %s' 
+                              % value )
 
         # Add number subgrade to base letter grade dict value
-        match = re.search( '[12345]', training_sample[idx] )
+        match = re.search( '[12345]', value )
         if match:
             tmp += int( match.group() )
         else:
-            raise ValueError( 'Unexpected value read from sub_grade @ training \
-            sample %d' % idx )
-            return
+            raise ValueError( 'Unexpected value read from sub_grade: %s' 
+                              % value )
 
         return tmp
 
@@ -98,8 +160,14 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of employment length feature
         idx = self.listIdx( 'emp_length' )
 
+        return self.empLengthValue( training_sample[idx] )
+
+
+    def empLengthValue( self, value ):
+        '''Convert a single employment length entry'''
+
         # Search for number of years
-        match = re.findall( '[<\+n123456789]', training_sample[idx] )
+        match = re.findall( '[<\+n123456789]', value )
         
         if match:
             # Take the last match for '10+' differentiation from '1'
@@ -115,9 +183,8 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
             else:
                 return int( tmp )
         else:
-            raise ValueError( 'Unexpected value read from emp_length @ training\
-            sample %d' % idx )
-            return
+            raise ValueError( 'Unexpected value read from emp_length: %s' 
+                              % value )
 
         
     def homeOwnershipEnumerator( self, training_sample ):
@@ -126,8 +193,14 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of home ownership feature
         idx = self.listIdx( 'home_ownership' )
 
+        return self.homeOwnershipValue( training_sample[idx] )
+
+
+    def homeOwnershipValue( self, value ):
+        '''Enumerate a single home ownership status'''
+
         # Search for expected values
-        match = re.search( 'RENT|OWN|MORTGAGE|OTHER', training_sample[idx] )
+        match = re.search( 'RENT|OWN|MORTGAGE|OTHER', value )
 
         if match:
             tmp = match.group()
@@ -144,9 +217,8 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
             else:
                 return 0
         else:
-            raise ValueError( 'Unexpected value read from home_ownership @ \
-            training sample %d' % idx )
-            return
+            raise ValueError( 'Unexpected value read from home_ownership: %s' 
+                              % value )
 
         
     def incomeVerifiedConversion( self, training_sample ):
@@ -155,8 +227,14 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of income verification feature
         idx = self.listIdx( 'is_inc_v' )
 
+        return self.incomeVerifiedValue( training_sample[idx] )
+
+
+    def incomeVerifiedValue( self, value ):
+        '''Convert a single income verification status'''
+
         # Search for 'not', indicating source not verified
-        match = re.search( 'Not', training_sample[idx] )
+        match = re.search( 'Not', value )
 
         if match:
             return 0
@@ -170,20 +248,19 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of income verification feature
         idx = self.listIdx( 'purpose' )
 
-        # Create an enumeration dictionary, try to enum from most to least
-        # credible and leave slot for others in the middle
-        purposeDict = {'car': 9, 'credit_card': 10, 'debt_consolidation': 5, 
-                       'education': 4, 'home_improvement': 2, 'house': 1,
-                       'major_purchase': 8, 'medical': 3,
-                       'small_business': 7, 'vacation': 12, 'wedding': 11}
-        
+        return self.purposeValue( training_sample[idx] )
+
+
+    def purposeValue( self, value ):
+        '''Enumerate a single loan purpose'''
+
         # Search for expected values
         regex = '|'.join( ['car', 'credit_card', 'debt_consolidation',
                            'education', 'home_improvement', 'house', 
                            'major_purchase', 'medical', 'small_business',
                            'vacation', 'wedding'] )
 
-        match = re.search( regex, training_sample[idx] )
+        match = re.search( regex, value )
 
         if match:
             purpose = match.group()
@@ -198,21 +275,13 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of income verification feature
         idx = self.listIdx( 'addr_state' )
 
-        # Create an enum dictionary - TODO: need to determine importance of
-        # assigned value to learning algorithm performance
-        stateDict = {'AK': 1,  'AL': 2,  'AR': 3,  'AZ': 4,  'CA': 5,  
-                     'CO': 6,  'CT': 7,  'DC': 8,  'DE': 9,  'FL': 10, 
-                     'GA': 11, 'HI': 12, 'IA': 13, 'ID': 14, 'IL': 15,
-                     'IN': 16, 'KS': 17, 'KY': 18, 'LA': 19, 'MA': 20,
-                     'MD': 21, 'ME': 22, 'MI': 23, 'MN': 24, 'MO': 25,
-                     'MS': 26, 'MT': 27, 'NC': 28, 'ND': 29, 'NE': 30,
-                     'NH': 31, 'NJ': 32, 'NM': 33, 'NV': 34, 'NY': 35,
-                     'OH': 36, 'OK': 37, 'OR': 38, 'PA': 39, 'PR': 40,
-                     'RI': 41, 'SC': 42, 'SD': 43, 'TN': 44, 'TX': 45,
-                     'UT': 46, 'VA': 47, 'VI': 48, 'VT': 49, 'WA': 50,
-                     'WI': 51, 'WV': 52, 'WY': 53}
-
-        return stateDict[training_sample[idx]]
+        return self.stateValue( training_sample[idx] )
+
+
+    def stateValue( self, value ):
+        '''Enumerate a single state entry'''
+
+        return stateDict[value]
         
 
     def earlyCrLineConversion( self, training_sample ):
@@ -221,12 +290,17 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of earliest credit line feature
         idx = self.listIdx( 'earliest_cr_line' )
 
+        return self.earlyCrLineValue( training_sample[idx] )
+
+
+    def earlyCrLineValue( self, value ):
+        '''Convert a single earliest line of credit date'''
+
         # Convert the date to a datetime object        
-        earlyCrLine = datetime.strptime( training_sample[idx],
-                                         "%m/%d/%Y  %H:%M" )
+        earlyCrLine = datetime.strptime( value, crLineDateFormat )
 
         # Return number of years since earliest line of credit
-        return datetime.today().year - earlyCrLine.year
+        return self.refYear - earlyCrLine.year
         
         #print(earlyCrLine.year)
         #print(datetime.today().year - earlyCrLine.year)
@@ -249,9 +323,18 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Get index of loan status feature
         idx = self.listIdx( 'loan_status' )
 
+        return self.statusValue( training_sample[idx] )
+
+
+    def statusValue( self, value ):
+        '''
+        Convert a single loan status entry
+        @return status: 0 = charged off, 1 = fully paid, 2 = not defined
+        '''
+
         # Search for desired status values - TODO: possibly add late statuses to
         # negative classification as well
-        match = re.search( 'Charged Off|Fully Paid', training_sample[idx] )
+        match = re.search( 'Charged Off|Fully Paid', value )
 
         # If we have a match, return conversion, otherwise remove the sample
         if match:
@@ -264,8 +347,238 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
             return 2
 
 
+    def isTerminalStatus( self, value ):
+        '''Row filter - True for 'Charged Off' or 'Fully Paid' loan status'''
+        return self.statusValue( value ) != 2
+
+
+    def convertColumn( self, col, conv ):
+        '''
+        Apply a single entry conversion to a whole column.  The conversion 
+        runs once per distinct entry and is mapped back through the codes.
+        @param col: numpy string array
+        @param conv: single entry conversion
+        @return out: float array, NaN where the conversion failed
+        '''
+        mValues, mCodes = np.unique( col, return_inverse=True )
+
+        out = np.full( len( mValues ), np.nan )
+        for i, value in enumerate( mValues ):
+            try:
+                out[i] = conv( value )
+            except ( ValueError, KeyError ):
+                pass
+
+        return out[mCodes.reshape( -1 )]
+
+
+    def floatColumn( self, col ):
+        '''
+        Parse a column as numbers
+        @return out: float array, NaN where an entry isn't a number
+        '''
+        try:
+            return col.astype( float )
+        except ValueError:
+            # Fall back to a per entry parse to locate the bad entries
+            return self.convertColumn( col, lambda v: np.array( v ).astype(
+                float ) )
+
+
+    def termColumn( self, col ):
+        '''Enumerate a loan term column, see termValue()'''
+        return np.where( np.char.find( col, '36' ) >= 0, 36., 60. )
+
+
+    def pcntColumn( self, col ):
+        '''Remove '%' from a whole column, see pcntValue()'''
+        mStripped = np.char.replace( col, '%', '' )
+        try:
+            return mStripped.astype( float )
+        except ValueError:
+            return self.convertColumn( col, self.pcntValue )
+
+
+    def loanGradeColumn( self, col ):
+        '''Hash a sub_grade column, see loanGradeValue()'''
+        return self.convertColumn( col, self.loanGradeValue )
+
+
+    def empLengthColumn( self, col ):
+        '''Convert an employment length column, see empLengthValue()'''
+        return self.convertColumn( col, self.empLengthValue )
+
+
+    def homeOwnershipColumn( self, col ):
+        '''Enumerate a home ownership column, see homeOwnershipValue()'''
+        return self.convertColumn( col, self.homeOwnershipValue )
+
+
+    def incomeVerifiedColumn( self, col ):
+        '''Convert an income verification column, see incomeVerifiedValue()'''
+        return np.where( np.char.find( col, 'Not' ) >= 0, 0., 1. )
+
+
+    def purposeColumn( self, col ):
+        '''Enumerate a loan purpose column, see purposeValue()'''
+        return self.convertColumn( col, self.purposeValue )
+
+
+    def stateColumn( self, col ):
+        '''Enumerate a state column, see stateValue()'''
+        return self.convertColumn( col, self.stateValue )
+
+
+    def dateColumn( self, col, fmt ):
+        '''
+        Parse a column of dates.  Each distinct entry is parsed once and 
+        memoized in dateCache for later columns and chunks.
+        @param col: numpy string array
+        @param fmt: strptime format of the entries
+        @return dates: datetime64[D] array, NaT where an entry isn't a date
+        '''
+        mValues, mCodes = np.unique( col, return_inverse=True )
+
+        mDates = np.empty( len( mValues ), dtype='datetime64[D]' )
+        for i, value in enumerate( mValues ):
+            key = ( value, fmt )
+            if key not in self.dateCache:
+                try:
+                    self.dateCache[key] = np.datetime64( 
+                        datetime.strptime( value, fmt ).date() )
+                except ValueError:
+                    self.dateCache[key] = np.datetime64( 'NaT' )
+            mDates[i] = self.dateCache[key]
+
+        return mDates[mCodes.reshape( -1 )]
+
+
+    def yearsSinceColumn( self, col, fmt ):
+        '''
+        Years elapsed from each date in a column to the reference year
+        @return years: float array, NaN where an entry isn't a date
+        '''
+        mDates = self.dateColumn( col, fmt )
+
+        # Calendar year of each date via datetime64 arithmetic
+        mYears = mDates.astype( 'datetime64[Y]' ).astype( float ) + 1970
+
+        return np.where( np.isnat( mDates ), np.nan, self.refYear - mYears )
+
+
+    def earlyCrLineColumn( self, col ):
+        '''Convert an earliest line of credit column, see earlyCrLineValue()'''
+        return self.yearsSinceColumn( col, crLineDateFormat )
+
+
+    def issueDateColumn( self, col ):
+        '''Years since the loan was issued'''
+        return self.yearsSinceColumn( col, monthDateFormat )
+
+
+    def lastPaymentDateColumn( self, col ):
+        '''Years since the last payment was received'''
+        return self.yearsSinceColumn( col, monthDateFormat )
+
+
+    def statusColumn( self, col ):
+        '''
+        Convert a loan status column, see statusValue()
+        @return status: 0 = charged off, 1 = fully paid, 2 = not defined
+        '''
+        # Position of each status in the entry, leftmost match wins
+        mChargedOff = np.char.find( col, 'Charged Off' )
+        mFullyPaid = np.char.find( col, 'Fully Paid' )
+
+        mIsChargedOff = ( mChargedOff >= 0 ) & ( ( mFullyPaid < 0 ) | 
+                                                 ( mChargedOff < mFullyPaid ) )
+        return np.where( mIsChargedOff, 0., 
+                         np.where( mFullyPaid >= 0, 1., 2. ) )
+
+
     def extractFeatures( self ):
-        '''Convert training data to format suitable for learning where needed'''
+        '''
+        Convert training data to format suitable for learning where needed.
+        Conversions run a whole column of a block of rows at a time, from the
+        typed columns in columnar mode or from the string training data 
+        otherwise, and the column statistics of the clean samples are 
+        accumulated block by block.
+        '''
+
+        # Log status - TODO: move this to a logging class
+        print( 'Preprocessing the data..' )
+
+        # Gather the source columns
+        if self.columns is not None:
+            mColumns = self.columns
+        else:
+            mData = self.trainingData.reshape( -1, len( self.features ) )
+            mColumns = {feature: mData[:, j] 
+                        for j, feature in enumerate( self.features )}
+
+        # Conversion of each column, the distinct entries of encoded columns
+        # are converted once for all blocks
+        mSchema = self.getSchema()
+        mConvs = list()
+        for j, feature in enumerate( self.features ):
+            conv = mSchema.convPlan[j]
+            if conv is None:
+                conv = self.floatColumn
+            mConvs.append( conv )
+        mEncoded = {j: mConvs[j]( mColumns[feature].values )
+                    for j, feature in enumerate( self.features )
+                    if isinstance( mColumns[feature], EncodedColumn )}
+        mLabelIdx = mSchema.index( mSchema.label )
+
+        # Run the conversion plan a block of rows at a time, compacting the
+        # clean samples of each block and summarizing them while they're at
+        # hand, so standardizing needs no pass of its own
+        nSamples = self.getSampleCnt()
+        mData = np.empty( ( nSamples, len( self.features ) ), 
+                          dtype=self.dtype )
+        mStats = ColumnStats( nFeatures=len( self.features ) )
+        nKept = 0
+        for i in range( 0, nSamples, ColumnStats.blockSize ):
+            rows = slice( i, min( i + ColumnStats.blockSize, nSamples ) )
+            block = np.empty( ( rows.stop - rows.start, len( self.features ) ),
+                              dtype=self.dtype )
+            for j, feature in enumerate( self.features ):
+                col = mColumns[feature]
+
+                if j in mEncoded:
+                    # Map the converted distinct entries back
+                    block[:, j] = mEncoded[j][col.codes[rows]]
+                elif col.dtype.kind == 'U':
+                    block[:, j] = mConvs[j]( col[rows] )
+                else:
+                    block[:, j] = col[rows]
+
+            # Failed conversions come through as NaN, and samples w/o a 
+            # terminal loan status are not classifiable
+            mDirtMask = np.any( np.isnan( block ), 1 )
+            mDirtMask |= block[:, mLabelIdx] == 2
+            block = block[~mDirtMask]
+
+            mData[nKept:nKept + len( block )] = block
+            mStats.merge( ColumnStats( block ) )
+            nKept += len( block )
+
+        # Keep the clean samples and release the source data
+        self.nRmvSamples = nSamples - nKept
+        self.trainingData = mData[:nKept]
+        self.columns = None
+        self.columnStats = mStats
+
+        # Log status - TODO: move this to a logging class
+        print( 'Removed = %d of %d input samples' % (
+            self.nRmvSamples, nSamples ) )
+
+
+    def extractFeaturesRowwise( self ):
+        '''
+        Reference sample-at-a-time conversion of the string training data,
+        kept for verifying and benchmarking extractFeatures()
+        '''
 
         # Log status - TODO: move this to a logging class
         print( 'Preprocessing the data..' )
@@ -388,7 +701,7 @@ class LendingClubFeatureExtractor( FeatureExtractor ):
         # Remove all marked dirty samples
         self.nRmvSamples = len( mDirtSet )
         self.trainingData = np.delete( self.trainingData, list( mDirtSet ), 0 )
-        self.trainingData = self.trainingData.astype( float )
+        self.trainingData = self.trainingData.astype( self.dtype )
 
         # Log status - TODO: move this to a logging class
         print( 'Removed = %d of %d input samples' % (
@@ -4,14 +4,19 @@ import sys
 import argparse
 import time
 import pickle
+import shutil
+import os
 import numpy as np
 from sklearn.externals import joblib
 from sklearn import preprocessing
-from inputReader import InputReader
+from inputReader import InputReader, expandInputPaths
 from lendingClubFeatureExtractor import LendingClubFeatureExtractor
+from featureStore import FeatureStore
+from featureCache import FeatureCache
 from logisticClassifier import LogisticClassifier
 from svmClassifier import SVMClassifier
 from dTreeClassifier import DecisionTreeClassifier
+from streamingClassifier import StreamingClassifier
 
 # Application version
 ''' Revision History
@@ -33,6 +38,35 @@ clfDumpLoc = '../tmp/clf.pickle'
 # Scaler dump location - MUST BE SAME AS the learningAgent's reference
 scalerDumpLoc = '../tmp/scaler.pickle'
 
+# Suffix of the classifier and scaler dumps of an update in progress
+newDumpSuffix = '.new'
+
+# Extracted feature cache location
+featureCacheDir = '../tmp/featureCache'
+
+def publishModel():
+    '''
+    Once an update has succeeded, keep the current classifier and scaler 
+    dumps as the next numbered model version, e.g. clf.pickle.1, and move
+    the updated dumps written next to them into their place
+    @return version: number of the archived version
+    '''
+    version = 1
+    while os.path.exists( '%s.%d' % ( clfDumpLoc, version ) ):
+        version += 1
+
+    for fPath in [clfDumpLoc, scalerDumpLoc]:
+        shutil.copyfile( fPath, '%s.%d' % ( fPath, version ) )
+        os.replace( fPath + newDumpSuffix, fPath )
+
+    return version
+
+def discardModel():
+    '''Remove the updated dumps of an update which didn't succeed'''
+    for fPath in [clfDumpLoc, scalerDumpLoc]:
+        if os.path.exists( fPath + newDumpSuffix ):
+            os.remove( fPath + newDumpSuffix )
+
 # Application entry and dependency injection
 def main():
 	
@@ -45,10 +79,52 @@ def main():
     parser.add_argument( '-v', '--version', action='version', 
                          version=appVersion )
 
-    # Option to pass in an input file to be processed
-    parser.add_argument( '-i', '--input', dest='inputFile',
-                         help='Input File Name', required=False,
-                         default=defaultInput )
+    # Option to pass in input file(s) to be processed
+    parser.add_argument( '-i', '--input', dest='inputFile', nargs='+',
+                         help='Input File Name(s) or glob pattern(s), several \
+                         files are extracted in parallel w/ --jobs and \
+                         combined', required=False, default=[defaultInput] )
+
+    # Option to specify binary feature store dump file
+    parser.add_argument( '-s', '--store', dest='storeFile', 
+                         help='File location for binary feature store dump, \
+                         a .npy store can be passed back in with -i to skip \
+                         extraction', required=False )
+
+    # Option to stream the input through overlapping read, extract and write
+    # stages
+    parser.add_argument( '--pipeline', dest='pipeline',
+                         help='Stream the input in blocks of this many rows \
+                         through reader, extraction (w/ --jobs) and writer \
+                         stages into the -d dump and/or -s store, holding \
+                         only a few blocks in memory.  Training then maps \
+                         the -s store, if given', required=False )
+
+    # Option to train out-of-core over blocks of the input
+    parser.add_argument( '--stream', dest='stream',
+                         help="Train out-of-core w/ SGD over blocks of this \
+                         many rows, holding a single block in memory.  Only \
+                         the 'logistic' and 'SVM'(linear) classifiers are \
+                         supported", required=False )
+
+    # Option to specify the number of out-of-core training passes
+    parser.add_argument( '--passes', dest='passes',
+                         help='Number of training passes over the input w/ \
+                         --stream', required=False, default=3 )
+
+    # Option to specify the number of blocks shuffled together
+    parser.add_argument( '--shuffleBlocks', dest='shuffleBlocks',
+                         help='Number of blocks the samples are shuffled \
+                         across w/ --stream, raise it for inputs ordered \
+                         over long runs of rows', required=False, default=8 )
+
+    # Option to reuse cached features from an earlier run
+    parser.add_argument( '--cache', dest='cache',
+                         help='Cache extracted features in %s and reuse \
+                         them while the input, filter and extractor are \
+                         unchanged, --pipeline always streams the input' % 
+                         featureCacheDir, required=False,
+                         action='store_true' )
 
     # Option to specify the type of learning agent to be used
     parser.add_argument( '--classifier', dest='cls',
@@ -63,11 +139,59 @@ def main():
                          'linear', 'poly', 'rbf'(default), or 'sigmoid' ", 
                          required=False, default='rbf' )
 
+    # Option to specify the SVM solver mode
+    parser.add_argument( '--svmMode', dest='svmMode',
+                         help="SVM solver, 'exact'(default) kernel SVM or \
+                         'scalable' linear SVM w/ the kernel approximated, \
+                         linear in the number of samples", required=False, 
+                         default='exact', choices=['exact', 'scalable'] )
+
+    # Option to specify the SVM probability calibration slice
+    parser.add_argument( '--calFraction', dest='calFraction',
+                         help='Fraction of the SVM training subset held out \
+                         to calibrate the probabilities of the stored \
+                         classifier, 0 disables calibration', required=False,
+                         default=0.2 )
+
     # Option to specify the test fraction used for learning
     parser.add_argument( '--testFraction', dest='tstFrac',
                          help="Fraction of data to be used for test, must be \
                          between 0 and 1", required=False, default=0.2 )
 
+    # Option to run k-fold cross validation
+    parser.add_argument( '--folds', dest='folds',
+                         help='Also report k-fold cross validation accuracy \
+                         over all samples, folds are fit in parallel w/ \
+                         --jobs', required=False )
+
+    # Option to disable fold stratification
+    parser.add_argument( '--noStratify', dest='noStratify',
+                         help='Split k-fold cross validation folds w/o \
+                         keeping the label proportions', required=False,
+                         action='store_true' )
+
+    # Option to search the classifier hyperparameters
+    parser.add_argument( '--search', dest='search',
+                         help='Search the classifier hyperparameters (C, \
+                         kernel or tree depth) w/ --folds (default 3) cross \
+                         validation over the training subset in --jobs \
+                         processes, then train w/ the best candidate', 
+                         required=False, action='store_true' )
+
+    # Option to sample the hyperparameter search at random
+    parser.add_argument( '--searchIter', dest='searchIter',
+                         help='Number of candidates sampled at random by \
+                         --search instead of trying the full grid', 
+                         required=False )
+
+    # Option to fit the logistic regularization path
+    parser.add_argument( '--regPath', dest='regPath',
+                         help='Fit a warm started logistic regression path \
+                         over C from 1e-4 to 1e5, pick the C of best --folds \
+                         (default 3) cross validation accuracy over the \
+                         training subset and keep its fit', 
+                         required=False, action='store_true' )
+
     # Option to specify pre-training dump file
     parser.add_argument( '-d', '--dump', dest='dumpFile', 
                          help='File location for pre-trained data dump', 
@@ -83,6 +207,26 @@ def main():
                          help='Feature Filter resource file', 
                          required=False , default='../res/FeatureFilter.csv' )
 
+    # Option to specify the dtype of the extracted training data
+    parser.add_argument( '--dtype', dest='dtype',
+                         help="Training data dtype, 'float32'(default) or \
+                         'float64'", required=False, default='float32',
+                         choices=['float32', 'float64'] )
+
+    # Option to specify the number of feature extraction processes
+    parser.add_argument( '-j', '--jobs', dest='jobs',
+                         help='Number of processes used for input parsing \
+                         and feature extraction', required=False, default=1 )
+
+    # Option to update the stored classifier rather than retrain it
+    parser.add_argument( '--update', dest='update',
+                         help="Update the stored 'logistic' classifier and \
+                         scaler w/ the input samples only, instead of \
+                         retraining on every sample, keeping the stored \
+                         classifier's regularization over -C.  The previous \
+                         versions are kept as numbered copies", required=False,
+                         action='store_true' )
+
     # Option to predict output of some input sample(s)
     parser.add_argument( '-p', '--predict', dest='predict',
                          help="Run application in prediction mode. \
@@ -93,42 +237,158 @@ def main():
     
     # Grab the inputs passed
     args = parser.parse_args()
-    m_inputFile = args.inputFile
+    m_inputFiles = expandInputPaths( args.inputFile )
+    m_inputFile = m_inputFiles[0]
     m_cls = args.cls
     m_kernel = args.kernel
+    m_svmMode = args.svmMode
+    m_calFraction = float(args.calFraction)
     m_tstFrac = float(args.tstFrac)
+    m_folds = int(args.folds) if args.folds is not None else None
+    m_stratify = not args.noStratify
+    m_search = args.search
+    m_regPath = args.regPath
+    m_searchIter = int(args.searchIter) if args.searchIter is not None \
+        else None
     m_reg = float(args.reg)
     if args.dumpFile is not None:
         m_dumpFile = args.dumpFile
     else:
         m_dumpFile = None
+    m_storeFile = args.storeFile
     m_filter = args.filterPath
     m_predict = args.predict
+    m_jobs = int(args.jobs)
+    m_dtype = np.dtype( args.dtype )
+    m_cache = args.cache
+    m_pipeline = int(args.pipeline) if args.pipeline is not None else None
+    m_stream = int(args.stream) if args.stream is not None else None
+    m_passes = int(args.passes)
+    m_shuffleBlocks = int(args.shuffleBlocks)
+    m_update = args.update
 
     # Generate time stamp for performance monitoring
     t0 = time.time()
 
+    # Only a logistic classifier trained in memory can be updated
+    if m_update and ( m_cls != 'logistic' or m_stream is not None ):
+        print( "Only the 'logistic' classifier can be updated, w/o --stream" )
+        return
+
+    # Streamed, pipelined and stored input is read from a single file
+    if m_predict is False and len( m_inputFiles ) > 1 and \
+        ( m_stream is not None or m_pipeline is not None or
+          any( f.endswith( '.npy' ) for f in m_inputFiles ) ):
+        print( 'Only a single input file can be used w/ --stream, '
+               '--pipeline or a .npy store' )
+        return
+
+    # Train out-of-core if specified by user, w/o extracting the whole input
+    if m_predict is False and m_stream is not None:
+        if m_cls not in StreamingClassifier.losses:
+            print( 'Invalid classifier passed.  See --help for valid options' )
+            return
+
+        mFeatureExtractor = LendingClubFeatureExtractor(
+            InputReader( m_inputFile ), m_filter, chunkSize=m_stream,
+            dtype=m_dtype )
+        mLearningAgent = StreamingClassifier( mFeatureExtractor, m_cls,
+                                              m_passes, m_shuffleBlocks )
+        mLearningAgent.setTstFraction( m_tstFrac )
+        mLearningAgent.setRegularization( m_reg )
+
+        # Train the classifier and report the accuracy against the test subset
+        mLearningAgent.trainModel()
+        print( 'Cross Validation accuracy on the test subset = %0.3f' % 
+               mLearningAgent.crossValidate() )
+
+        # Dump the classifier and scaler objects to file
+        mLearningAgent.dumpClassifier()
+
+        print('Classifier coefficients:')
+        print(mLearningAgent.getClfCoeffs())
+
+        # Generate end time stamp and report processing time
+        t1 = time.time()
+        total = t1 - t0
+        print( 'Total processing time = %3.2f seconds' % total )
+
     # Branch on predict flag
-    if m_predict is False:
-        # Construct the InputReader w/ our input file
-        mInputReader = InputReader( m_inputFile )
+    elif m_predict is False:
+        # Look up previously extracted features if caching - pipeline mode
+        # always streams the input, as it writes the dump and store as it goes
+        mFeatureExtractor = None
+        if m_cache and not m_inputFile.endswith( '.npy' ) and \
+            m_pipeline is None:
+            mCache = FeatureCache( featureCacheDir )
+            mCacheKey = mCache.key( m_inputFiles, m_filter, 
+                                    LendingClubFeatureExtractor, m_dtype )
+            mFeatureExtractor = mCache.lookup( mCacheKey )
+
+        # A binary feature store is mapped straight in w/o extraction
+        if mFeatureExtractor is not None:
+            pass
+        elif m_inputFile.endswith( '.npy' ):
+            mFeatureExtractor = FeatureStore( m_inputFile, m_filter )
+            mFeatureExtractor.applyFeatureFilter()
+        elif m_pipeline is not None:
+            if m_dumpFile is None and m_storeFile is None:
+                print( 'Pipeline mode needs a -d dump and/or -s store file' )
+                return
+
+            # Stream the input straight through to the dump and store
+            mFeatureExtractor = LendingClubFeatureExtractor( 
+                InputReader( m_inputFile ), m_filter, chunkSize=m_pipeline,
+                dtype=m_dtype )
+            mFeatureExtractor.runPipeline( m_dumpFile, m_storeFile, m_jobs )
+
+            # Only a written store can be trained on w/o holding the data,
+            # w/ the statistics accumulated while streaming
+            if m_storeFile is None:
+                return
+            mColumnStats = mFeatureExtractor.getColumnStats()
+            mFeatureExtractor = FeatureStore( m_storeFile, m_filter )
+            mFeatureExtractor.columnStats = mColumnStats
+        elif len( m_inputFiles ) > 1:
+            # Extract each input file in its own process and combine them
+            mFeatureExtractor = LendingClubFeatureExtractor.extractFiles( 
+                m_inputFiles, m_filter, m_jobs, m_dtype )
+
+            # Keep the result for later runs
+            if m_cache:
+                mCache.insert( mCacheKey, mFeatureExtractor )
+        else:
+            # Construct the InputReader w/ our input file, parsed in byte
+            # ranges across the worker processes
+            mInputReader = InputReader( m_inputFile, m_jobs )
 
-        # Next, construct our LendingClubFeatureExtractor object
-        mFeatureExtractor = LendingClubFeatureExtractor( mInputReader, 
-                                                         m_filter )
+            # Next, construct our LendingClubFeatureExtractor object
+            mFeatureExtractor = LendingClubFeatureExtractor( mInputReader, 
+                                                             m_filter,
+                                                             dtype=m_dtype )
 
-        # Use the FeatureExtractor to convert the data for learning
-        mFeatureExtractor.extractFeatures()
-        mFeatureExtractor.applyFeatureFilter()
+            # Use the FeatureExtractor to convert the data for learning
+            mFeatureExtractor.extractFeaturesParallel( m_jobs )
+            mFeatureExtractor.applyFeatureFilter()
 
-        # Dump pre-trained data if specified by user
-        if m_dumpFile is not None:
+            # Keep the result for later runs
+            if m_cache:
+                mCache.insert( mCacheKey, mFeatureExtractor )
+
+        # Dump pre-trained data if specified by user, unless already streamed
+        if m_dumpFile is not None and m_pipeline is None:
             mFeatureExtractor.setOutCSVPath( m_dumpFile )
             mFeatureExtractor.writeFeaturesToCSV()
 
+        # Write the binary feature store if specified by user
+        if m_storeFile is not None and m_pipeline is None:
+            mFeatureExtractor.writeFeatureStore( m_storeFile )
+
         # Construct a LearningAgent based on user input
         if m_cls == 'SVM':
-            mLearningAgent = SVMClassifier( mFeatureExtractor, m_kernel )
+            mLearningAgent = SVMClassifier( mFeatureExtractor, m_kernel, 
+                                            m_svmMode )
+            mLearningAgent.setCalibration( m_calFraction )
         elif m_cls == 'logistic':
             mLearningAgent = LogisticClassifier( mFeatureExtractor )
         elif m_cls == 'dTree':
@@ -146,15 +406,65 @@ def main():
         # Apply preprocessing to the training samples
         mLearningAgent.shuffleSamples()
         mLearningAgent.sampleSlice()
-        mLearningAgent.standardizeSamples()
 
-        # Train the classifier and report the accuracy against the test subset
-        mLearningAgent.trainModel()
-        print( 'Cross Validation accuracy on the test subset = %0.3f' % 
-               mLearningAgent.crossValidate() )
+        # Tune the classifier hyperparameters over the training subset if 
+        # specified by user
+        if m_search and not m_update:
+            mLearningAgent.searchParams( nIter=m_searchIter, 
+                                         k=m_folds if m_folds else 3,
+                                         nJobs=m_jobs )
+
+        if m_update:
+            # Try to read in the stored classifier and scaler
+            try:
+                clf = joblib.load( clfDumpLoc )
+                with open( scalerDumpLoc, 'rb' ) as f:
+                    scaler = pickle.load( f )
+            except FileNotFoundError:
+                print( 'Error! No classifier binary file found.' )
+                print( 'Did you train a classifier yet??' )
+                return
+
+            # Update w/ the new samples, writing the updated dumps aside
+            # until the whole update has succeeded
+            mLearningAgent.clfPath = clfDumpLoc + newDumpSuffix
+            mLearningAgent.scalerPath = scalerDumpLoc + newDumpSuffix
 
-        # Dump the classifier object to file
-        mLearningAgent.dumpClassifier()
+        try:
+            if m_update:
+                mLearningAgent.updateModel( clf, scaler )
+            else:
+                mLearningAgent.standardizeSamples()
+
+                # Fit the regularization path and keep the best C, fitted on
+                # the training subset, if specified by user - otherwise train
+                # the classifier
+                if m_regPath and m_cls == 'logistic':
+                    mLearningAgent.regularizationPath( 
+                        k=m_folds if m_folds else 3 )
+                else:
+                    mLearningAgent.trainModel()
+
+            # Report the accuracy against the test subset
+            print( 'Cross Validation accuracy on the test subset = %0.3f' % 
+                   mLearningAgent.crossValidate() )
+
+            # Report k-fold cross validation accuracy if specified by user
+            if m_folds is not None and not m_update:
+                mLearningAgent.kFoldValidate( m_folds, m_jobs, m_stratify )
+
+            # Dump the classifier object to file
+            mLearningAgent.dumpClassifier()
+        except BaseException:
+            # Leave no partial update next to the stored classifier
+            if m_update:
+                discardModel()
+            raise
+
+        # Keep the previous version and put the updated one in its place
+        if m_update:
+            print( 'Archived the previous classifier as version %d' % 
+                   publishModel() )
 
         # Print out the classifier coefficients
         if m_cls == 'logistic' or m_cls == 'dTree':
@@ -170,14 +480,15 @@ def main():
     # through it
     else:
         # Construct an input reader
-        mInputReader = InputReader( predictInput )
+        mInputReader = InputReader( predictInput, m_jobs )
 
         # Next, construct our LendingClubFeatureExtractor object
         mFeatureExtractor = LendingClubFeatureExtractor( mInputReader, 
-                                                         m_filter )
+                                                         m_filter,
+                                                         dtype=m_dtype )
 
         # Use the FeatureExtractor to convert the data
-        mFeatureExtractor.extractFeatures()
+        mFeatureExtractor.extractFeaturesParallel( m_jobs )
         mFeatureExtractor.applyFeatureFilter()
 
         # Dump pre-trained data if specified by user
@@ -194,7 +505,7 @@ def main():
             return
             
         # Get the output idx and remove the appropriate column from the input
-        outputIdx = mFeatureExtractor.listIdx( 'loan_status' )
+        outputIdx = mFeatureExtractor.getSchema().labelIdx
         data = mFeatureExtractor.getTrainingData()
         data = np.delete( data, outputIdx, 1 )
 
@@ -216,8 +527,9 @@ def main():
                 result = 1
 
             print( 'Predicted outcome of loan: %s' % prediction )
-            print( 'Certainty in outcome is: %.1f percent' % 
-                   ( clf.predict_proba(sample)[0][result] * 100 ) )
+            if hasattr( clf, 'predict_proba' ):
+                print( 'Certainty in outcome is: %.1f percent' % 
+                       ( clf.predict_proba(sample)[0][result] * 100 ) )
             print()
 
         print( clf )
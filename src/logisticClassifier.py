@@ -4,9 +4,10 @@ import sys
 sys.path.append( '..' )
 from featureExtractor import FeatureExtractor
 from learningAgent import LearningAgent
-from sklearn import linear_model
+from sklearn import linear_model, model_selection
 from sklearn.externals import joblib
 import numpy as np
+import copy
 
 class LogisticClassifier( LearningAgent ):
     ''' 
@@ -75,6 +76,141 @@ class LogisticClassifier( LearningAgent ):
         self.clf = linear_model.LogisticRegression( C=self.reg )
 
 
+    def regularizationPath( self, Cs=None, k=3 ):
+        '''
+        Fit a sequence of regularization parameters from strongest to weakest
+        regularization, warm starting each fit from the previous coefficients
+        so the path costs about as much as a few cold fits.  Each parameter 
+        is scored by k-fold cross validation over the training subset, 
+        leaving the test subset for the final report, and the classifier is
+        left fitted on the whole training subset w/ the best scoring 
+        parameter, so it needs no trainModel() call of its own.
+        @param Cs: inverse regularization values, default 1e-4 to 1e5
+        @param k: number of cross validation folds
+        @return Cs, coefs, scores: ascending parameter values, and the
+        training subset coefficients and mean validation accuracy of each
+        '''
+        if Cs is None:
+            Cs = np.logspace( -4, 5, 10 )
+        Cs = np.sort( Cs )
+
+        # Log status - TODO: move this to a logging class
+        print( 'Fitting regularization path of %d values on %d samples w/ '
+               '%d-fold cross validation' % 
+               ( len( Cs ), len( self.X_train ), k ) )
+
+        # Validation accuracy of each parameter, averaged over the folds
+        scores = np.zeros( len( Cs ) )
+        mFolds = model_selection.StratifiedKFold( k ).split( self.X_train,
+                                                             self.y_train )
+        for trn, val in mFolds:
+            mFits = self.warmPath( Cs, self.X_train[trn], self.y_train[trn] )
+            scores += np.array( [clf.score( self.X_train[val], 
+                                            self.y_train[val] ) 
+                                 for clf in mFits] ) / k
+
+        # Path over the whole training subset
+        mFits = self.warmPath( Cs, self.X_train, self.y_train )
+        coefs = np.array( [clf.coef_ for clf in mFits] )
+
+        # Log status - TODO: move this to a logging class
+        for C, score, clf in zip( Cs, scores, mFits ):
+            print( 'C = %g: validation accuracy = %0.3f, %d iterations' % 
+                   ( C, score, np.max( clf.n_iter_ ) ) )
+
+        # Keep the best fit, cold starting from here on
+        best = int( np.argmax( scores ) )
+        self.reg = Cs[best]
+        self.clf = mFits[best]
+        self.clf.set_params( warm_start=False )
+
+        return Cs, coefs, scores
+
+
+    def warmPath( self, Cs, X, y ):
+        '''
+        @param Cs: ascending inverse regularization values
+        @param X, y: samples and labels to fit
+        @return fits: LogisticRegression fitted w/ each value, each warm 
+        started from the previous one
+        '''
+        # A single estimator carries its coefficients from one fit to the next
+        mClf = linear_model.LogisticRegression( C=Cs[0], warm_start=True )
+
+        mFits = list()
+        for C in Cs:
+            mClf.set_params( C=C )
+            mClf.fit( X, y )
+            mFits.append( copy.deepcopy( mClf ) )
+
+        return mFits
+
+
+    def updateModel( self, clf, scaler ):
+        '''
+        Update a persisted classifier w/ the samples at hand instead of 
+        retraining on every sample seen so far, in time proportional to the
+        new samples only.  The scaler statistics are merged w/ the training
+        subset's, and a single SGD pass over the training subset moves the
+        coefficients w/ a step size of 1 / ( h * n ), where h is the mean 
+        log loss curvature of the standardized samples and n the total 
+        sample count, i.e. each sample is weighted as one of all n samples.
+        A LogisticRegression is converted to an SGD logistic regression on
+        its first update.  The regularization is the persisted model's, its
+        C, or the C its SGD alpha was set from over the samples it has seen.
+        @param clf: persisted LogisticRegression, or SGDClassifier w/ the
+        log loss
+        @param scaler: persisted StandardScaler the classifier was fitted w/
+        '''
+        assert( isinstance( clf, ( linear_model.LogisticRegression,
+                                   linear_model.SGDClassifier ) ) )
+        mean, scale, nSeen = self.updateScaler( scaler )
+        nTotal = nSeen + len( self.X_train )
+
+        # Log status - TODO: move this to a logging class
+        print( 'Updating a classifier of %d samples w/ %d samples' % 
+               ( nSeen, len( self.X_train ) ) )
+
+        # Keep regularizing w/ the persisted model's C
+        if isinstance( clf, linear_model.SGDClassifier ):
+            self.reg = 1.0 / ( clf.alpha * nSeen )
+        else:
+            self.reg = clf.C
+            clf = self.sgdClassifier( clf )
+        assert( clf.loss == 'log_loss' )
+
+        self.clf = clf
+        self.rescaleClassifier( mean, scale )
+
+        # Regularize as LogisticRegression's C over all the samples, an 
+        # alpha which gives the same C back on the next update
+        p = self.clf.predict_proba( self.X_train )[:, 1]
+        h = np.mean( p * ( 1 - p ) )
+        self.clf.set_params( alpha=1.0 / ( self.reg * nTotal ),
+                             learning_rate='constant', 
+                             eta0=1.0 / ( h * nTotal ) )
+
+        order = np.random.RandomState( 0 ).permutation( len( self.X_train ) )
+        self.clf.partial_fit( self.X_train[order], self.y_train[order] )
+
+
+    def sgdClassifier( self, clf ):
+        '''
+        @param clf: fitted LogisticRegression
+        @return sgdClf: SGD logistic regression w/ the fitted coefficients
+        '''
+        mSGDClf = linear_model.SGDClassifier( loss='log_loss', 
+                                              random_state=0 )
+
+        # A single sample allocates the coefficients, its step is overwritten
+        mSGDClf.partial_fit( self.X_train[:1], self.y_train[:1], 
+                             classes=clf.classes_ )
+        mSGDClf.coef_[:] = clf.coef_
+        mSGDClf.intercept_[:] = clf.intercept_
+
+        return mSGDClf
+
+
     def getClfCoeffs( self ):
         '''Return classifier learning weights'''
         return self.clf.coef_
@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from featureExtractor import FeatureExtractor
+from learningAgent import LearningAgent
+from columnStats import ColumnStats
+from sklearn import linear_model, preprocessing
+from sklearn.externals import joblib
+import numpy as np
+import pickle
+
+class StreamingClassifier( LearningAgent ):
+    '''
+    Out-of-core implementation of the LearningAgent base class.  Samples are
+    streamed from a chunked FeatureExtractor one block at a time, standardized
+    w/ the column statistics the extractor accumulates over a first pass, and
+    fed to an SGD trained linear model through partial_fit() over several 
+    more passes of the input.
+    The input may be ordered, e.g. by loan status, so samples are shuffled
+    across chunks through a buffer of a few chunks.  Memory is bounded by 
+    the chunk and buffer sizes rather than the size of the input.
+    '''
+
+    # Classifier loss by model type
+    losses = {'logistic': 'log_loss', 'SVM': 'hinge'}
+
+    def __init__( self, featureExtractor, model='logistic', nPasses=3,
+                  bufferChunks=8 ):
+        '''
+        @param featureExtractor: FeatureExtractor object in chunked mode, see
+        genFeatureChunks()
+        @param model: 'logistic' for logistic regression, or 'SVM' for a
+        linear SVM
+        @param nPasses: number of training passes over the input
+        @param bufferChunks: number of chunks the samples are shuffled across
+        '''
+        assert( featureExtractor.chunkSize is not None )
+        assert( model in self.losses )
+
+        # Invoke the super's constructor with the FeatureExtractor, no samples
+        # are held until the input is streamed
+        super().__init__( featureExtractor )
+        self.featureExtractor = featureExtractor
+        self.model = model
+        self.nPasses = nPasses
+        self.bufferChunks = bufferChunks
+
+        # Set default regularization parameter to be 1
+        self.reg = 1.0
+
+        # Training samples per pass, counted by the statistics pass
+        self.nTrain = None
+
+        # Seed for the sample shuffle
+        self.seed = 0
+
+        # Running standardization statistics
+        self.scaler = preprocessing.StandardScaler()
+
+        # Create the classifier
+        self.clf = self.buildClassifier()
+
+
+    def buildClassifier( self ):
+        '''
+        @return clf: unfitted SGD classifier for the model type.  SGD 
+        averages the loss over samples, so the inverse regularization 
+        parameter is scaled by the training sample count to an alpha w/ the
+        same meaning as LogisticRegression's C.
+        '''
+        alpha = 1.0 / ( self.reg * ( self.nTrain or 1 ) )
+        return linear_model.SGDClassifier( loss=self.losses[self.model],
+                                           alpha=alpha,
+                                           random_state=self.seed )
+
+
+    def setTrainingData( self, data ):
+        '''Samples are streamed per chunk, so none are held'''
+        self.trainingData = data
+
+
+    def genSamples( self ):
+        '''
+        Generator for one pass over the input - splits each chunk into its
+        features and labels and marks the chunk's test subset.  The test
+        subset is every 1 / tstFraction-th sample of the input, so it is the
+        same on every pass.
+        @return X, y, isTest: chunk features, labels and test subset mask
+        '''
+        nSeen = 0
+        for chunk in self.featureExtractor.genFeatureChunks():
+            xIdx = [j for j in range( chunk.shape[1] ) if j != self.y_idx]
+
+            # Sample i is tested if a test sample boundary falls within it
+            idx = np.arange( nSeen, nSeen + len( chunk ) )
+            isTest = ( np.floor( ( idx + 1 ) * self.tstFraction ) >
+                       np.floor( idx * self.tstFraction ) )
+            nSeen += len( chunk )
+
+            yield ( chunk[:, xIdx], self.labelVector( chunk[:, self.y_idx] ),
+                    isTest )
+
+
+    def genShuffled( self, mRandom ):
+        '''
+        Generator for one pass over the training subset, shuffled across 
+        chunks.  Chunks fill a buffer of up to bufferChunks chunks, which is
+        shuffled once full, and the first half of it is yielded while the
+        rest stays to be mixed w/ the following chunks.
+        @param mRandom: numpy RandomState of the shuffle
+        @return X, y: shuffled batch of training features and labels
+        '''
+        mBufferSize = self.bufferChunks * self.featureExtractor.chunkSize
+        mBufferX = list()
+        mBufferY = list()
+        nBuffered = 0
+
+        for X, y, isTest in self.genSamples():
+            mBufferX.append( X[~isTest] )
+            mBufferY.append( y[~isTest] )
+            nBuffered += np.sum( ~isTest )
+            if nBuffered < mBufferSize:
+                continue
+
+            # Shuffle the full buffer, yield half and keep the other half
+            X = np.concatenate( mBufferX )
+            y = np.concatenate( mBufferY )
+            order = mRandom.permutation( len( X ) )
+            nYield = len( X ) // 2
+            yield X[order[:nYield]], y[order[:nYield]]
+
+            mBufferX = [X[order[nYield:]]]
+            mBufferY = [y[order[nYield:]]]
+            nBuffered = len( X ) - nYield
+
+        # Shuffle and yield what's left at the end of the input
+        if nBuffered > 0:
+            X = np.concatenate( mBufferX )
+            y = np.concatenate( mBufferY )
+            order = mRandom.permutation( len( X ) )
+            yield X[order], y[order]
+
+
+    def trainModel( self ):
+        '''
+        Train the classifier over nPasses passes of the input, after a first
+        pass extracting the column statistics.  The training subset's are 
+        those of all samples, less the test subset's.
+        '''
+
+        # Log status - TODO: move this to a logging class
+        print( 'Training w/ %s SGD in %d passes of %d sample chunks' %
+               ( self.model, self.nPasses, self.featureExtractor.chunkSize ) )
+
+        # Mean and variance of the training subset, w/o summarizing any 
+        # samples but the test subset's
+        mTestStats = ColumnStats()
+        for X, y, isTest in self.genSamples():
+            mTestStats.merge( ColumnStats( X[isTest] ) )
+
+        mStats = self.featureExtractor.getColumnStats()
+        mStats = mStats.project( [j for j in range( len( mStats ) ) 
+                                  if j != self.y_idx] )
+        self.scaler = mStats.remove( mTestStats ).scaler()
+        self.nTrain = int( self.scaler.n_samples_seen_ )
+
+        mRandom = np.random.RandomState( self.seed )
+        self.clf = self.buildClassifier()
+
+        for i in range( self.nPasses ):
+            self.featureExtractor.rewind()
+
+            nTrain = 0
+            for X, y in self.genShuffled( mRandom ):
+                self.clf.partial_fit( self.scaler.transform( X ), y,
+                                      classes=np.array( [0, 1] ) )
+                nTrain += len( X )
+
+            # Log status - TODO: move this to a logging class
+            print( 'Pass %d: trained on %d samples' % ( i + 1, nTrain ) )
+
+        # Leave the input ready for crossValidate()
+        self.featureExtractor.rewind()
+
+
+    def crossValidate( self ):
+        '''Return the model's accuracy on the test subset, in a single pass'''
+        nTest = 0
+        nCorrect = 0
+        for X, y, isTest in self.genSamples():
+            if not np.any( isTest ):
+                continue
+            mPred = self.clf.predict( self.scaler.transform( X[isTest] ) )
+            nCorrect += np.sum( mPred == y[isTest] )
+            nTest += np.sum( isTest )
+
+        # Log status - TODO: move this to a logging class
+        print( 'Testing on %d samples' % nTest )
+
+        self.featureExtractor.rewind()
+        return nCorrect / nTest
+
+
+    def genPrediction( self , data ):
+        '''
+        Generate a prediction for any new, standardized samples
+        @return classification: boolean classification '0' = loan charged off,
+                                                       '1' = loan paid
+        '''
+        assert( isinstance( data, np.ndarray ) )
+        return self.clf.predict( data )
+
+
+    def genProbPrediction( self , data ):
+        '''
+        Generate the classification probablility for any new, standardized
+        samples - logistic model only
+        @return cls_list: 0-1 probability of sample belonging to each class
+        '''
+        assert( isinstance( data, np.ndarray ) )
+        return self.clf.predict_proba( data )
+
+
+    def setRegularization( self, reg ):
+        '''Setter for regularization parameter'''
+        self.reg = reg
+
+        # Re-configure the classifier
+        self.clf = self.buildClassifier()
+
+
+    def getClfCoeffs( self ):
+        '''Return classifier learning weights'''
+        return self.clf.coef_
+
+
+    def dumpClassifier( self ):
+        '''
+        Method to serialize and dump the classifier class, along w/ the
+        running statistics scaler used by sample predictions
+        '''
+        joblib.dump( self.clf, self.clfPath )
+
+        with open( self.scalerPath, 'wb' ) as f:
+            pickle.dump( self.scaler, f )
+
+    def __del__( self ):
+        pass
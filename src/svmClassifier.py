@@ -4,21 +4,38 @@ import sys
 sys.path.append( '..' )
 from featureExtractor import FeatureExtractor
 from learningAgent import LearningAgent
-from sklearn import svm
+from sklearn import svm, pipeline, kernel_approximation
+from sklearn.calibration import CalibratedClassifierCV
 from sklearn.externals import joblib
 import numpy as np
 
+try:
+    from sklearn.frozen import FrozenEstimator
+except ImportError:
+    # Older scikit-learn calibrates a fitted estimator w/ cv='prefit' instead
+    FrozenEstimator = None
+
 class SVMClassifier( LearningAgent ):
     ''' 
     Support Vector Machine implementation of the LearningAgent base class
     '''
 
-    def __init__( self , featureExtractor, kernel='rbf' ):
+    # Hyperparameters tuned by searchParams()
+    paramSetters = {'reg': 'setRegularization', 'kernel': 'setKernelType'}
+    searchGrid = {'reg': [1e-1, 1, 1e1, 1e2], 
+                  'kernel': ['linear', 'poly', 'rbf', 'sigmoid']}
+
+    def __init__( self , featureExtractor, kernel='rbf', mode='exact',
+                  nComponents=500 ):
         '''
         @param featureExtractor: FeatureExtractor object for fetching
         preprocessed training data
         @param kernel: Type of kernel to use with the SVM
+        @param mode: 'exact' kernel SVM, or 'scalable' linear solver w/ the
+        kernel approximated, see buildClassifier()
+        @param nComponents: size of the approximate kernel feature map
         '''
+        assert( mode in ['exact', 'scalable'] )
         
         # Invoke the super's constructor with the FeatureExtractor
         super().__init__( featureExtractor )
@@ -29,24 +46,96 @@ class SVMClassifier( LearningAgent ):
         # Set the kernel type
         self.kernel = kernel
 
+        # Set the solver mode and kernel approximation size
+        self.mode = mode
+        self.nComponents = nComponents
+
+        # Fraction of the training subset held out for probability 
+        # calibration by trainModel(), and the calibrated classifier
+        self.calFraction = 0.2
+        self.calibratedClf = None
+
         # Create the classifier
+        self.clf = self.buildClassifier()
+
+
+    def buildClassifier( self ):
         '''
-        @param C: inverse of regularization, larger C -> lower regularization
-        @param kernel: type of kernel to be used in the SVM
-        @param probability: enables probability output capability for the 
-        classifier, increases time to learn
+        Create the classifier for the current regularization, kernel and mode.
+        'exact' trains svm.SVC, which scales at least quadratically w/ the
+        number of samples.  'scalable' trains a liblinear svm.LinearSVC, 
+        linear in the number of samples - directly for the linear kernel,
+        otherwise on a Nystroem approximation of the kernel's feature map.
+        @return clf: unfitted classifier
         '''
-        self.clf = svm.SVC( C=self.reg, kernel=self.kernel, probability=True )
+        if self.mode == 'exact':
+            '''
+            @param C: inverse of regularization, larger C -> lower 
+            regularization
+            @param kernel: type of kernel to be used in the SVM
+            Note: probabilities are calibrated separately by trainModel(),
+            rather than w/ SVC's internal cross validation on every fit
+            '''
+            return svm.SVC( C=self.reg, kernel=self.kernel )
+
+        # Primal solver, the samples far outnumber the features
+        mLinearSVC = svm.LinearSVC( C=self.reg, dual=False )
+        if self.kernel == 'linear':
+            return mLinearSVC
+
+        return pipeline.make_pipeline( 
+            kernel_approximation.Nystroem( kernel=self.kernel, 
+                                           n_components=self.nComponents,
+                                           random_state=0 ),
+            mLinearSVC )
 
 
     def trainModel( self ):
         '''Train the classifier with the X_train and y_train members'''
         
+        # Hold out the tail of the training subset for calibration
+        nCal = int( self.calFraction * len( self.X_train ) ) \
+            if self.calFraction else 0
+        nFit = len( self.X_train ) - nCal
+
         # Log status - TODO: move this to a logging class
-        print( 'Training on %d samples w/ SVM (%s kernel)' % 
-               ( len( self.X_train ), self.kernel ) )
+        print( 'Training on %d samples w/ SVM (%s kernel, %s)' % 
+               ( nFit, self.kernel, self.mode ) )
         
-        self.clf.fit( self.X_train, self.y_train )
+        self.clf.fit( self.X_train[:nFit], self.y_train[:nFit] )
+
+        # Fit the probability calibration once, on the held out samples
+        self.calibratedClf = None
+        if nCal:
+            self.calibrate( self.X_train[nFit:], self.y_train[nFit:] )
+
+
+    def calibrate( self, X_cal, y_cal ):
+        '''
+        Fit sigmoid (Platt) probability calibration of the trained classifier
+        on samples it was not trained on
+        @param X_cal: calibration samples
+        @param y_cal: calibration labels
+        '''
+        # Log status - TODO: move this to a logging class
+        print( 'Calibrating probabilities on %d samples' % len( X_cal ) )
+
+        if FrozenEstimator is not None:
+            self.calibratedClf = CalibratedClassifierCV( 
+                FrozenEstimator( self.clf ), method='sigmoid' )
+        else:
+            self.calibratedClf = CalibratedClassifierCV( 
+                self.clf, method='sigmoid', cv='prefit' )
+        self.calibratedClf.fit( X_cal, y_cal )
+
+
+    def setCalibration( self, fraction ):
+        '''
+        Setter for the fraction of the training subset held out for 
+        probability calibration, 0 or None trains w/o probabilities
+        '''
+        assert( fraction is None or 0 <= fraction < 1 )
+        self.calFraction = fraction
 
 
     def crossValidate( self ):
@@ -74,7 +163,8 @@ class SVMClassifier( LearningAgent ):
         @return cls_list: 0-1 probability of sample belonging to each class
         '''
         assert( isinstance( data, np.ndarray ) )
-        return self.clf.predict_proba( data )
+        assert( self.calibratedClf is not None )
+        return self.calibratedClf.predict_proba( data )
 
     
     def setRegularization( self, reg ):
@@ -82,7 +172,7 @@ class SVMClassifier( LearningAgent ):
         self.reg = reg
 
         # Re-configure the classifier
-        self.clf = svm.SVC( C=self.reg, kernel=self.kernel, probability=True )
+        self.clf = self.buildClassifier()
 
         
     def setKernelType( self , kernel ):
@@ -90,7 +180,7 @@ class SVMClassifier( LearningAgent ):
         self.kernel = kernel
 
         # Re-configure the classifier
-        self.clf = svm.SVC( C=self.reg, kernel=self.kernel, probability=True )
+        self.clf = self.buildClassifier()
 
 
     def getClfCoeffs( self ):
@@ -99,8 +189,14 @@ class SVMClassifier( LearningAgent ):
 
 
     def dumpClassifier ( self ):
-        ''' Method to serialize and dump the classifier class '''
-        joblib.dump( self.clf, self.clfPath )
+        ''' 
+        Method to serialize and dump the classifier class, calibrated for
+        probability output if it was trained w/ calibration
+        '''
+        if self.calibratedClf is not None:
+            joblib.dump( self.calibratedClf, self.clfPath )
+        else:
+            joblib.dump( self.clf, self.clfPath )
 
         
     def __del__( self ):
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from columnStats import ColumnStats
+from sklearn import preprocessing
+import numpy as np
+import unittest
+
+class ColumnStatsTest( unittest.TestCase ):
+
+    def setUp( self ):
+        '''Samples w/ spread out scales, offsets and a constant column'''
+        mRandom = np.random.RandomState( 0 )
+        self.mData = ( mRandom.normal( size=( 1000, 5 ) ) * 
+                       [1, 10, 1e3, 0, 1] + [0, 5, 1e5, 3, 0] ).astype( 
+                           np.float32 )
+        self.mScaler = preprocessing.StandardScaler().fit( self.mData )
+
+    def test_merge( self ):
+        '''Test blocks merge to the statistics of all their samples'''
+        mStats = ColumnStats( nFeatures=5 )
+        for i in range( 0, 1000, 300 ):
+            mStats.merge( ColumnStats( self.mData[i:i + 300] ) )
+
+        self.assertEqual( mStats.count, 1000 )
+        np.testing.assert_allclose( mStats.mean, self.mScaler.mean_ )
+        np.testing.assert_allclose( mStats.variance(), self.mScaler.var_,
+                                    rtol=1e-6 )
+
+    def test_blockSize( self ):
+        '''Test samples summarized in row blocks match a single block'''
+        mStats = ColumnStats( self.mData )
+        mBlockSize = ColumnStats.blockSize
+        ColumnStats.blockSize = 64
+        try:
+            mBlockStats = ColumnStats( self.mData )
+        finally:
+            ColumnStats.blockSize = mBlockSize
+
+        np.testing.assert_allclose( mBlockStats.mean, mStats.mean )
+        np.testing.assert_allclose( mBlockStats.m2, mStats.m2, rtol=1e-6 )
+
+    def test_remove( self ):
+        '''Test removing a block leaves the statistics of the rest'''
+        mStats = ColumnStats( self.mData ).remove( 
+            ColumnStats( self.mData[800:] ) )
+        mScaler = preprocessing.StandardScaler().fit( self.mData[:800] )
+
+        self.assertEqual( mStats.count, 800 )
+        np.testing.assert_allclose( mStats.mean, mScaler.mean_ )
+        np.testing.assert_allclose( mStats.variance(), mScaler.var_,
+                                    rtol=1e-5 )
+
+        # Assert removing no samples changes nothing
+        mStats.remove( ColumnStats() )
+        self.assertEqual( mStats.count, 800 )
+
+        # Assert removing every sample leaves empty statistics
+        mStats.remove( ColumnStats( self.mData[:800] ) )
+        self.assertEqual( mStats.count, 0 )
+        np.testing.assert_array_equal( mStats.m2, np.zeros( 5 ) )
+
+    def test_project( self ):
+        '''Test projection keeps the selected columns'''
+        mStats = ColumnStats( self.mData ).project( [0, 2] )
+        self.assertEqual( len( mStats ), 2 )
+        np.testing.assert_allclose( mStats.mean, self.mScaler.mean_[[0, 2]] )
+
+    def test_scaler( self ):
+        '''Test the scaler matches a fitted one and transforms in place'''
+        mScaler = ColumnStats( self.mData ).scaler()
+        np.testing.assert_allclose( mScaler.scale_, self.mScaler.scale_ )
+        self.assertEqual( mScaler.scale_[3], 1 )
+
+        mData = np.copy( self.mData )
+        mScaled = mScaler.transform( mData )
+        self.assertTrue( np.shares_memory( mScaled, mData ) )
+        np.testing.assert_allclose( mScaled, 
+                                    self.mScaler.transform( self.mData ),
+                                    atol=1e-5 )
+
+if __name__ == '__main__':
+    unittest.main()
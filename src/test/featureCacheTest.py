@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from inputReader import InputReader
+from lendingClubFeatureExtractor import LendingClubFeatureExtractor
+from featureCache import FeatureCache
+import numpy as np
+import os
+import tempfile
+import unittest
+
+# Test resource must be relative to class under test
+testFile = '../../res/LendingClubFeatureExtractorTest.csv'
+filterTestFile = '../../res/FeatureFilter.csv'
+pushdownFilterFile = '../../res/LendingClubFeatureFilterTest.csv'
+
+class FeatureCacheTest( unittest.TestCase ):
+
+    def setUp( self ):
+        '''Set up an empty cache and an extracted test resource'''
+        self.mTmpDir = tempfile.TemporaryDirectory()
+        self.mCache = FeatureCache( self.mTmpDir.name )
+
+        self.mFeatureExtractor = LendingClubFeatureExtractor( 
+            InputReader( testFile ), filterTestFile )
+        self.mFeatureExtractor.extractFeatures()
+
+    def tearDown( self ):
+        self.mTmpDir.cleanup()
+
+    def test_key( self ):
+        '''Test the key is stable and changes w/ the filter'''
+        mKey = self.mCache.key( testFile, filterTestFile, 
+                                LendingClubFeatureExtractor )
+        self.assertEqual( mKey, self.mCache.key( 
+            testFile, filterTestFile, LendingClubFeatureExtractor ) )
+        self.assertNotEqual( mKey, self.mCache.key(
+            testFile, pushdownFilterFile, LendingClubFeatureExtractor ) )
+
+    def test_lookup( self ):
+        '''Test a miss, then a hit returning the stored features'''
+        self.assertEqual( self.mCache.lookup( 'abc' ), None )
+
+        self.mCache.insert( 'abc', self.mFeatureExtractor )
+        mStore = self.mCache.lookup( 'abc' )
+
+        self.assertEqual( mStore.getFeatures(), 
+                          self.mFeatureExtractor.getFeatures() )
+        np.testing.assert_array_equal( mStore.getTrainingData(),
+                                       self.mFeatureExtractor.getTrainingData() )
+
+    def test_evict( self ):
+        '''Test least recently used entries are evicted over the size cap'''
+        self.mCache.insert( 'old', self.mFeatureExtractor )
+        self.mCache.insert( 'new', self.mFeatureExtractor )
+
+        # Age the first entry, then shrink the cap to a single entry
+        os.utime( self.mCache.storePath( 'old' ), ( 0, 0 ) )
+        mPath = self.mCache.storePath( 'new' )
+        self.mCache.maxBytes = ( os.path.getsize( mPath ) + 
+                                 os.path.getsize( mPath + '.features' ) )
+        self.mCache.evict()
+
+        self.assertEqual( self.mCache.lookup( 'old' ), None )
+        self.assertNotEqual( self.mCache.lookup( 'new' ), None )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -104,6 +104,22 @@ class FeatureExtractorTest( unittest.TestCase ):
         for i,v in enumerate( self.mFeatureExtractor.features ):
             self.assertEqual( i, self.mFeatureExtractor.listIdx( v ) )
 
+    def test_filterListReadOnce( self ):
+        '''Test recompiling the schema reuses the filter list read up front'''
+        mFilterReader = self.mFeatureExtractor.filterReader
+        mReads = list()
+        mFilterReader.readFile = lambda: mReads.append( 1 )
+
+        # Replace the feature list, forcing the schema to be compiled again
+        self.mFeatureExtractor.features = list(
+            self.mFeatureExtractor.features )
+        mSchema = self.mFeatureExtractor.getSchema()
+
+        # Assert the filter resource isn't read again
+        self.assertEqual( mReads, [] )
+        self.assertEqual( mSchema.filterList,
+                          self.mFeatureExtractor.filterList )
+
 if __name__ == '__main__':
     unittest.main()
 
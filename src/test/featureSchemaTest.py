@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from featureSchema import FeatureSchema
+import unittest
+
+class FeatureSchemaTest( unittest.TestCase ):
+
+    def setUp( self ):
+        '''Compile a schema w/ one filtered feature and one conversion'''
+        self.mConv = lambda col: col
+        self.mSchema = FeatureSchema( ['term', 'loan_status', 'dti', 'desc'],
+                                      ['desc', 'NotAFeature'],
+                                      {'term': self.mConv} )
+
+    def test_index( self ):
+        '''Test name to index map and ValueError on unknown features'''
+        self.assertEqual( self.mSchema.index( 'dti' ), 2 )
+        self.assertEqual( self.mSchema.labelIdx, 1 )
+        self.assertRaises( ValueError, self.mSchema.index, 'NotAFeature' )
+
+    def test_convPlan( self ):
+        '''Test conversion plan holds one step per column in order'''
+        self.assertEqual( self.mSchema.convPlan,
+                          [self.mConv, None, None, None] )
+
+    def test_project( self ):
+        '''Test projection drops the filtered features'''
+        self.assertEqual( self.mSchema.keepIdx, [0, 1, 2] )
+
+        mProjected = self.mSchema.project()
+        self.assertEqual( mProjected.features, ['term', 'loan_status', 'dti'] )
+        self.assertEqual( mProjected.labelIdx, 1 )
+        self.assertEqual( mProjected.convPlan, [self.mConv, None, None] )
+
+if __name__ == '__main__':
+    unittest.main()
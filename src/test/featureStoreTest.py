@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from inputReader import InputReader
+from lendingClubFeatureExtractor import LendingClubFeatureExtractor
+from featureStore import FeatureStore
+import numpy as np
+import os
+import tempfile
+import unittest
+
+# Test resource must be relative to class under test
+testFile = '../../res/LendingClubFeatureExtractorTest.csv'
+filterTestFile = '../../res/FeatureFilter.csv'
+pushdownFilterFile = '../../res/LendingClubFeatureFilterTest.csv'
+
+class FeatureStoreTest( unittest.TestCase ):
+
+    def setUp( self ):
+        '''Extract the test resource and write it to a feature store'''
+        self.mFeatureExtractor = LendingClubFeatureExtractor( 
+            InputReader( testFile ), filterTestFile )
+        self.mFeatureExtractor.extractFeatures()
+
+        self.mTmpDir = tempfile.TemporaryDirectory()
+        self.mStorePath = os.path.join( self.mTmpDir.name, 'store.npy' )
+        self.mFeatureExtractor.writeFeatureStore( self.mStorePath )
+
+    def tearDown( self ):
+        self.mTmpDir.cleanup()
+
+    def test_load( self ):
+        '''Test the store maps back the extracted features and data'''
+        mStore = FeatureStore( self.mStorePath, filterTestFile )
+        mStore.extractFeatures()
+
+        self.assertTrue( isinstance( mStore.getTrainingData(), np.memmap ) )
+        self.assertEqual( mStore.getFeatures(), 
+                          self.mFeatureExtractor.getFeatures() )
+        np.testing.assert_array_equal( mStore.getTrainingData(),
+                                       self.mFeatureExtractor.getTrainingData() )
+
+        # The store keeps the dtype it was written w/
+        self.assertEqual( mStore.getTrainingData().dtype, np.float32 )
+        self.assertEqual( mStore.dtype, np.float32 )
+
+    def test_applyFeatureFilter( self ):
+        '''Test a filter can be applied on top of the stored features'''
+        mStore = FeatureStore( self.mStorePath, pushdownFilterFile )
+        mStore.applyFeatureFilter()
+
+        self.assertFalse( 'installment' in mStore.getFeatures() )
+        self.assertEqual( len( mStore.getFeatures() ),
+                          mStore.getTrainingData().shape[1] )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,24 @@
 
 import sys
 sys.path.append( '..' )
-from inputReader import InputReader
+from inputReader import InputReader, expandInputPaths, recordRanges
+import numpy as np
+import gzip
+import bz2
+import lzma
+import os
+import shutil
+import tempfile
+import zipfile
 import unittest
 
 # Test resource must be relative to class under test
 testFile = '../../res/InputReaderTest.csv'
 
+def filterOnes( value ):
+    '''Row filter - picklable for the parallel reader'''
+    return value != '1'
+
 class InputReaderTest(unittest.TestCase):
 
     def setUp( self ):
@@ -22,6 +34,141 @@ class InputReaderTest(unittest.TestCase):
                                     ['1', '44', '-4.3'],
                                      ['234', '-45', '0.45']] )
 
+    def test_readChunks( self ):
+        ''' Test chunked read yields the body in fixed size row blocks '''
+        mChunks = list( self.mInputReader.readChunks( 1 ) )
+
+        # Header is held back and each sample arrives in its own block
+        self.assertEqual( self.mInputReader.getHeader(),
+                          ['InputReader', 'Test', 'CSV'] )
+        self.assertEqual( len( mChunks ), 2 )
+        self.assertEqual( mChunks[0].tolist(), [['1', '44', '-4.3']] )
+        self.assertEqual( mChunks[1].tolist(), [['234', '-45', '0.45']] )
+
+    def test_rewind( self ):
+        ''' Test a rewound reader reads the same blocks again '''
+        mChunks = list( self.mInputReader.readChunks( 1 ) )
+        self.mInputReader.rewind()
+        mRewound = list( self.mInputReader.readChunks( 1 ) )
+
+        self.assertEqual( [chunk.tolist() for chunk in mRewound],
+                          [chunk.tolist() for chunk in mChunks] )
+        self.assertEqual( self.mInputReader.getHeader(),
+                          ['InputReader', 'Test', 'CSV'] )
+
+    def test_readColumns( self ):
+        ''' Test columnar read types each column from its contents '''
+        mHeader, mColumns = self.mInputReader.readColumns()
+        self.assertEqual( mHeader, ['InputReader', 'Test', 'CSV'] )
+
+        # Integer and float columns are parsed straight to numbers
+        self.assertEqual( mColumns['InputReader'].dtype, np.int64 )
+        self.assertEqual( mColumns['CSV'].dtype, np.float64 )
+        np.testing.assert_array_equal( mColumns['Test'], [44, -45] )
+        np.testing.assert_array_equal( mColumns['CSV'], [-4.3, 0.45] )
+
+    def test_readColumnsStrFeatures( self ):
+        ''' Test requested text columns are left as strings '''
+        mHeader, mColumns = self.mInputReader.readColumns( ['Test'], 
+                                                           encode=False )
+        self.assertEqual( mColumns['Test'].tolist(), ['44', '-45'] )
+
+    def test_readColumnsEncoded( self ):
+        ''' Test text columns are dictionary encoded by default '''
+        mHeader, mColumns = self.mInputReader.readColumns( ['Test'] )
+        mEncoded = mColumns['Test']
+
+        # Distinct entries are stored once and decode back to the column
+        self.assertEqual( sorted( mEncoded.values.tolist() ), ['-45', '44'] )
+        self.assertEqual( mEncoded.decode().tolist(), ['44', '-45'] )
+        self.assertEqual( mEncoded[1:].decode().tolist(), ['-45'] )
+
+    def test_setRowFilter( self ):
+        ''' Test rows failing the row predicate are skipped at read time '''
+        self.mInputReader.setRowFilter( 'Test', lambda v: float( v ) > 0 )
+        self.mInputReader.readFile()
+        self.assertEqual( self.mInputReader.getRawData(), 
+                          [['InputReader', 'Test', 'CSV'], ['1', '44', '-4.3']] )
+        self.assertEqual( self.mInputReader.getSkippedCnt(), 1 )
+
+    def test_compressedRead( self ):
+        ''' Test compressed copies of the test csv read the same '''
+        mTmpDir = tempfile.TemporaryDirectory()
+        mPath = os.path.join( mTmpDir.name, 'test' )
+
+        # Names deliberately carry no extension, detection is by content
+        mCopies = list()
+        for mOpen in [gzip.open, bz2.open, lzma.open]:
+            mCopies.append( mPath + str( len( mCopies ) ) )
+            with open( testFile, 'rb' ) as src:
+                with mOpen( mCopies[-1], 'wb' ) as dst:
+                    shutil.copyfileobj( src, dst )
+        mCopies.append( mPath + 'zip' )
+        with zipfile.ZipFile( mCopies[-1], 'w' ) as mArchive:
+            mArchive.write( testFile, 'test.csv' )
+
+        self.mInputReader.readFile()
+        for mCopy in mCopies:
+            mReader = InputReader( mCopy )
+            mReader.readFile()
+            self.assertEqual( mReader.getRawData(), 
+                              self.mInputReader.getRawData() )
+            del mReader
+
+        mTmpDir.cleanup()
+
+    def test_parallelRead( self ):
+        '''Test byte range parallel parsing matches the serial reader'''
+        mTmpDir = tempfile.TemporaryDirectory()
+        mFile = os.path.join( mTmpDir.name, 'Quoted.csv' )
+
+        # Quoted fields w/ embedded newlines, commas and escaped quotes
+        with open( mFile, 'w' ) as f:
+            f.write( 'id,desc,"multi\nline"\n' )
+            for i in range( 50 ):
+                f.write( '%d,"line one\nline ""%d"", two\n\n",%d\n' % 
+                         ( i, i, i % 3 ) )
+
+        # Ranges are contiguous and cover the body after the header
+        mRanges = recordRanges( mFile, 4 )
+        self.assertEqual( len( mRanges ), 4 )
+        self.assertEqual( mRanges[0][0], len( 'id,desc,"multi\nline"\n' ) )
+        for prev, cur in zip( mRanges, mRanges[1:] ):
+            self.assertEqual( prev[1], cur[0] )
+        self.assertEqual( mRanges[-1][1], os.path.getsize( mFile ) )
+
+        mSerialReader = InputReader( mFile )
+        mSerialReader.setRowFilter( 'multi\nline', lambda v: v != '1' )
+        mSerialReader.readFile()
+
+        mParallelReader = InputReader( mFile, 4 )
+        mParallelReader.setRowFilter( 'multi\nline', filterOnes )
+        mParallelReader.readFile()
+        self.assertEqual( mParallelReader.getRawData(),
+                          mSerialReader.getRawData() )
+        self.assertEqual( mParallelReader.getSkippedCnt(), 17 )
+
+        # Columnar reads match as well
+        header, mColumns = InputReader( mFile ).readColumns()
+        mParallelHeader, mParallelColumns = InputReader( mFile, 3 ).readColumns()
+        self.assertEqual( mParallelHeader, header )
+        np.testing.assert_array_equal( mParallelColumns['desc'].decode(),
+                                       mColumns['desc'].decode() )
+        np.testing.assert_array_equal( mParallelColumns['id'], mColumns['id'] )
+
+        mTmpDir.cleanup()
+
+    def test_expandInputPaths( self ):
+        '''Test glob patterns expand sorted and plain paths pass through'''
+        mPaths = expandInputPaths( ['../../res/LoanSubSet*.csv', testFile,
+                                    '../../res/NonExist.csv'] )
+
+        # Matches are sorted, de-duplicated and unmatched patterns kept
+        self.assertIn( '../../res/LoanSubSet3a.csv', mPaths )
+        self.assertEqual( mPaths, sorted( set( mPaths ), key=mPaths.index ) )
+        self.assertEqual( mPaths[-1], '../../res/NonExist.csv' )
+        self.assertEqual( expandInputPaths( [testFile, testFile] ), [testFile] )
+
     def test_pathSet( self ):
         ''' Test set file path and FileNotFoundError exception'''
         # Set a bogus file name
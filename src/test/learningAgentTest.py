@@ -5,8 +5,14 @@ sys.path.append( '..' )
 from inputReader import InputReader
 from lendingClubFeatureExtractor import LendingClubFeatureExtractor
 from learningAgent import LearningAgent
+from dTreeClassifier import DecisionTreeClassifier
+from columnStats import ColumnStats
+from testFixtures import separableExtractor, separableSamples
 from math import ceil, fabs, sqrt
+from sklearn import tree
 import numpy as np
+import os
+import tempfile
 import unittest
 
 # Test array
@@ -45,6 +51,12 @@ class DummyLearningAgentImpl( LearningAgent ):
 
     def getClfCoeffs( self ):
         '''Dummy implementation'''
+
+    def setRegularization( self, reg ):
+        '''Dummy implementation'''
+
+    def dumpClassifier( self ):
+        '''Dummy implementation'''
         
     def __del__( self ):
         pass
@@ -67,6 +79,14 @@ class LearningAgentTest( unittest.TestCase ):
         # Now, construct the class under test with the FeatureExtractor
         self.mLearningAgent = DummyLearningAgentImpl( self.mFeatureExtractor )
 
+        # Dump the scaler to a scratch location
+        self.mTmpDir = tempfile.TemporaryDirectory()
+        self.mLearningAgent.scalerPath = os.path.join( self.mTmpDir.name,
+                                                       'scaler.pickle' )
+
+    def tearDown( self ):
+        self.mTmpDir.cleanup()
+
 
     def test_getTrainingData( self ):
         '''Test getTrainingData() function returns correct data'''
@@ -148,6 +168,27 @@ class LearningAgentTest( unittest.TestCase ):
                          < 0.001 )
 
 
+    def test_standardizeSamplesStats( self ):
+        '''
+        Test standardizing from the extractor's column statistics matches 
+        fitting the training subset
+        '''
+        self.mFeatureExtractor.columnStats = ColumnStats( g_testArray )
+        mLearningAgent = DummyLearningAgentImpl( self.mFeatureExtractor )
+        mLearningAgent.scalerPath = self.mLearningAgent.scalerPath
+
+        for agent in [self.mLearningAgent, mLearningAgent]:
+            agent.sampleSlice( 0.4 )
+            agent.standardizeSamples()
+
+        np.testing.assert_allclose( mLearningAgent.scaler.mean_,
+                                    self.mLearningAgent.scaler.mean_ )
+        np.testing.assert_allclose( mLearningAgent.X_train,
+                                    self.mLearningAgent.X_train, atol=1e-9 )
+        np.testing.assert_allclose( mLearningAgent.X_test,
+                                    self.mLearningAgent.X_test, atol=1e-9 )
+
+
     def test_shuffleSamples( self ):
         '''Test shuffleSamples() function shuffles samples correctly'''
         
@@ -160,10 +201,84 @@ class LearningAgentTest( unittest.TestCase ):
         # Make LearningAgent call w/ the same seed
         self.mLearningAgent.shuffleSamples( 1 )
 
-        # Assert data is shuffled as expected
-        np.testing.assert_array_equal( g_testArray[m_indices], 
+        # Assert the sample order is shuffled as expected, w/o moving the data
+        np.testing.assert_array_equal( m_indices, self.mLearningAgent.order )
+        np.testing.assert_array_equal( g_testArray,
                                        self.mLearningAgent.trainingData )
+
+        # Assert the subsets are gathered in the shuffled order
+        m_yIdx = self.mFeatureExtractor.listIdx( 'loan_status' )
+        mShuffled = np.delete( g_testArray[m_indices], m_yIdx, 1 )
+        mBnd = len( self.mLearningAgent.X_train )
+        np.testing.assert_array_equal( mShuffled[:mBnd], 
+                                       self.mLearningAgent.X_train )
+        np.testing.assert_array_equal( mShuffled[mBnd:], 
+                                       self.mLearningAgent.X_test )
+        self.assertTrue( self.mLearningAgent.X_train.flags['C_CONTIGUOUS'] )
+        
+
+    def test_kFoldValidate( self ):
+        '''Test parallel k-fold cross validation matches a serial run'''
+
+        # Separable samples w/ the label in its schema column
+        self.mLearningAgent.setTrainingData( separableSamples( 
+            self.mFeatureExtractor, 60, ( 1, 0 ), noise=0 ) )
+        self.mLearningAgent.clf = tree.DecisionTreeClassifier( random_state=0 )
+
+        mScores, mFitTimes = self.mLearningAgent.kFoldValidate( 3 )
+        mParallelScores, mParallelFitTimes = \
+            self.mLearningAgent.kFoldValidate( 3, 2 )
+
+        # Assert identical folds and a score and fit time for each
+        np.testing.assert_array_equal( mParallelScores, mScores )
+        self.assertEqual( len( mParallelFitTimes ), 3 )
+        self.assertTrue( np.all( mScores > 0.8 ) )
+
+        # Assert the classifier itself was left unfitted
+        self.assertFalse( hasattr( self.mLearningAgent.clf, 'tree_' ) )
+
+
+    def test_searchParams( self ):
+        '''Test grid and random search score and pick a candidate'''
+
+        # Separable samples w/ the label in its schema column
+        mAgent = DecisionTreeClassifier( separableExtractor( nSamples=60, 
+                                                             weights=( 1, 0 ),
+                                                             noise=0 ) )
+
+        # Record the folds the candidates are scored on
+        mAgent.sampleSlice( 0.25 )
+        mFolds = list()
+        mFitFolds = mAgent.fitFolds
+        def recordFolds( clfs, folds, nJobs ):
+            mFolds.extend( folds )
+            return mFitFolds( clfs, folds, nJobs )
+        mAgent.fitFolds = recordFolds
+
+        mGrid = {'maxDepth': [1, 3]}
+        mBest, mResults = mAgent.searchParams( mGrid, k=3 )
+
+        # Assert the folds split the training subset only
+        for trn, tst in mFolds:
+            self.assertEqual( sorted( np.concatenate( [trn, tst] ) ),
+                              sorted( mAgent.trainIdx ) )
+        mParallelBest, mParallelResults = mAgent.searchParams( mGrid, k=3, 
+                                                               nJobs=2 )
+
+        # Assert one result per candidate, identical in parallel
+        self.assertEqual( [params for params, score, t in mResults],
+                          [{'maxDepth': 1}, {'maxDepth': 3}] )
+        self.assertEqual( [score for params, score, t in mParallelResults],
+                          [score for params, score, t in mResults] )
+        self.assertEqual( mParallelBest, mBest )
+
+        # Assert the agent is left configured w/ the best candidate
+        self.assertEqual( mAgent.clf.max_depth, mBest['maxDepth'] )
+
+        # Random search samples the requested number of candidates
+        mBest, mResults = mAgent.searchParams( mGrid, nIter=1, k=3, seed=0 )
+        self.assertEqual( len( mResults ), 1 )
+
         
-                                           
 if __name__ == '__main__':
     unittest.main()
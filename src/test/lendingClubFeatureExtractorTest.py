@@ -4,14 +4,18 @@ import sys
 sys.path.append( '..' )
 from inputReader import InputReader
 from lendingClubFeatureExtractor import LendingClubFeatureExtractor
+from columnStats import ColumnStats
 import numpy as np
 import csv
 import re
+import os
+import tempfile
 import unittest
 
 # Test resource must be relative to class under test
 testFile = '../../res/LendingClubFeatureExtractorTest.csv'
 filterTestFile = '../../res/FeatureFilter.csv'
+pushdownFilterFile = '../../res/LendingClubFeatureFilterTest.csv'
 
 class LendingClubFeatureExtractorTest( unittest.TestCase ):
 
@@ -203,6 +207,7 @@ class LendingClubFeatureExtractorTest( unittest.TestCase ):
 
         # Time elapsed since 2014
         delta = 42
+        self.mFeatureExtractor.refYear = 2014
 
         # Push null entries into testDate to simulate feature placement in 
         # the training set
@@ -213,6 +218,20 @@ class LendingClubFeatureExtractorTest( unittest.TestCase ):
         self.assertEqual( delta, self.mFeatureExtractor.
                           earlyCrLineConversion( testDate ) )
 
+    def test_yearsSinceColumn( self ):
+        '''Date columns are parsed once per distinct entry'''
+
+        # Pin the reference year for the test
+        self.mFeatureExtractor.refYear = 2014
+        col = np.array( ['Dec-2011', 'Jan-1999', 'Dec-2011', 'bogus'] )
+
+        mYears = self.mFeatureExtractor.issueDateColumn( col )
+        np.testing.assert_array_equal( mYears, [3, 15, 3, np.nan] )
+
+        # Assert each distinct entry was memoized once
+        self.assertEqual( len( self.mFeatureExtractor.dateCache ), 3 )
+
+
     def test_statusConversion( self ):
         '''Loan status conversion test'''
 
@@ -249,5 +268,279 @@ class LendingClubFeatureExtractorTest( unittest.TestCase ):
                           self.mFeatureExtractor.getRmvSampleCnt() )
 
 
+    def test_extractFeaturesRowwise( self ):
+        '''Column-at-a-time extraction matches the sample-at-a-time path'''
+
+        # Run the reference path on a second extractor over the same file
+        mRowExtractor = LendingClubFeatureExtractor( InputReader( testFile ),
+                                                     filterTestFile )
+        mRowExtractor.extractFeaturesRowwise()
+        self.mFeatureExtractor.extractFeatures()
+
+        # Assert identical output and removal count
+        np.testing.assert_array_equal( self.mFeatureExtractor.getTrainingData(),
+                                       mRowExtractor.getTrainingData() )
+        self.assertEqual( self.mFeatureExtractor.getRmvSampleCnt(),
+                          mRowExtractor.getRmvSampleCnt() )
+
+
+    def test_extractFeaturesBlocks( self ):
+        '''Extraction in row blocks matches a single block, w/ its statistics'''
+        self.mFeatureExtractor.extractFeatures()
+        mData = self.mFeatureExtractor.getTrainingData()
+        mStats = self.mFeatureExtractor.getColumnStats()
+
+        # Assert the statistics are those of the extracted samples
+        mAllStats = ColumnStats( nFeatures=mData.shape[1] )
+        mAllStats.count = len( mData )
+        mAllStats.mean = np.mean( mData, 0 )
+        mAllStats.m2 = np.sum( ( mData - mAllStats.mean ) ** 2, 0 )
+        self.assertEqual( mStats.count, mAllStats.count )
+        np.testing.assert_allclose( mStats.mean, mAllStats.mean )
+        np.testing.assert_allclose( mStats.m2, mAllStats.m2, rtol=1e-6 )
+
+        mBlockSize = ColumnStats.blockSize
+        ColumnStats.blockSize = 3
+        try:
+            for columnar in [False, True]:
+                mBlockExtractor = LendingClubFeatureExtractor( 
+                    InputReader( testFile ), filterTestFile, 
+                    columnar=columnar )
+                mBlockExtractor.extractFeatures()
+
+                # Assert identical output, removal count and statistics
+                np.testing.assert_array_equal( 
+                    mBlockExtractor.getTrainingData(), mData )
+                self.assertEqual( mBlockExtractor.getRmvSampleCnt(),
+                                  self.mFeatureExtractor.getRmvSampleCnt() )
+                self.assertEqual( mBlockExtractor.getColumnStats().count,
+                                  mStats.count )
+                np.testing.assert_allclose( 
+                    mBlockExtractor.getColumnStats().mean, mStats.mean )
+                np.testing.assert_allclose( 
+                    mBlockExtractor.getColumnStats().m2, mStats.m2, 
+                    rtol=1e-6 )
+        finally:
+            ColumnStats.blockSize = mBlockSize
+
+
+    def test_columnConversions( self ):
+        '''Column conversions agree w/ the single entry conversions'''
+
+        fe = self.mFeatureExtractor
+        mValueConv = {'term': fe.termValue, 'int_rate': fe.pcntValue,
+                      'revol_util': fe.pcntValue, 'sub_grade': fe.loanGradeValue,
+                      'emp_length': fe.empLengthValue, 
+                      'home_ownership': fe.homeOwnershipValue,
+                      'is_inc_v': fe.incomeVerifiedValue,
+                      'loan_status': fe.statusValue, 'purpose': fe.purposeValue,
+                      'addr_state': fe.stateValue,
+                      'earliest_cr_line': fe.earlyCrLineValue}
+
+        # Include entries that miss the lookup tables or fail to convert
+        mOddEntries = {'sub_grade': ['Z1', 'x A3'], 'emp_length': ['5'],
+                       'purpose': ['scar'], 'addr_state': ['XX'],
+                       'home_ownership': ['NONE'], 'int_rate': ['a%'],
+                       'loan_status': ['Fully Paid Charged Off', 'Late']}
+
+        for feature, valueConv in mValueConv.items():
+            conv = fe.featureConvLookup[feature]
+            col = np.append( fe.getTrainingData()[:, fe.listIdx( feature )],
+                             mOddEntries.get( feature, [] ) )
+
+            # Build the expected column one entry at a time
+            mExpected = list()
+            for value in col:
+                try:
+                    mExpected.append( valueConv( value ) )
+                except ( ValueError, KeyError ):
+                    mExpected.append( np.nan )
+
+            np.testing.assert_array_equal( conv( col ), mExpected )
+
+
+    def test_extractFeaturesParallel( self ):
+        '''Sharded multiprocess extraction matches a serial run'''
+
+        # Run the serial path on a second extractor over the same file
+        mSerialExtractor = LendingClubFeatureExtractor( InputReader( testFile ),
+                                                        filterTestFile )
+        mSerialExtractor.extractFeatures()
+        self.mFeatureExtractor.extractFeaturesParallel( 3 )
+
+        # Assert identical output and removal count
+        np.testing.assert_array_equal( self.mFeatureExtractor.getTrainingData(),
+                                       mSerialExtractor.getTrainingData() )
+        self.assertEqual( self.mFeatureExtractor.getRmvSampleCnt(),
+                          mSerialExtractor.getRmvSampleCnt() )
+
+        # Assert the merged shard statistics match the serial ones
+        mStats = self.mFeatureExtractor.getColumnStats()
+        mSerialStats = mSerialExtractor.getColumnStats()
+        self.assertEqual( mStats.count, mSerialStats.count )
+        np.testing.assert_allclose( mStats.mean, mSerialStats.mean )
+        np.testing.assert_allclose( mStats.variance(), 
+                                    mSerialStats.variance(), atol=1e-9 )
+
+
+    def test_extractFiles( self ):
+        '''Per file extraction of several inputs is combined in order'''
+        self.mFeatureExtractor.extractFeatures()
+        self.mFeatureExtractor.applyFeatureFilter()
+        mData = self.mFeatureExtractor.getTrainingData()
+
+        # Extract the same file twice across two processes
+        mCombined = LendingClubFeatureExtractor.extractFiles( 
+            [testFile, testFile], filterTestFile, 2 )
+
+        # Assert the rows are stacked and the removal counts summed
+        self.assertEqual( mCombined.getFeatures(),
+                          self.mFeatureExtractor.getFeatures() )
+        np.testing.assert_array_equal( mCombined.getTrainingData(),
+                                       np.vstack( (mData, mData) ) )
+        self.assertEqual( mCombined.getRmvSampleCnt(),
+                          2 * self.mFeatureExtractor.getRmvSampleCnt() )
+
+        # Assert the combined extractor holds its data in memory, w/o an 
+        # input of its own
+        self.assertIsNone( mCombined.inputReader )
+        self.assertIsNone( mCombined.chunkSize )
+        self.assertEqual( mCombined.getSchema().labelIdx,
+                          self.mFeatureExtractor.getSchema().labelIdx )
+
+        # Inputs w/ differing headers cannot be combined
+        mTmpDir = tempfile.TemporaryDirectory()
+        mOtherFile = os.path.join( mTmpDir.name, 'Other.csv' )
+        with open( testFile ) as src, open( mOtherFile, 'w' ) as dst:
+            for line in src:
+                dst.write( line.rsplit( ',', 1 )[0] + '\n' )
+        self.assertRaises( ValueError, LendingClubFeatureExtractor.extractFiles,
+                           [testFile, mOtherFile], filterTestFile )
+        mTmpDir.cleanup()
+
+
+    def test_filterPushdown( self ):
+        '''Filtered features are dropped at read time'''
+
+        # Extract the unfiltered file and drop the columns afterwards
+        self.mFeatureExtractor.extractFeatures()
+        mDropIdx = [self.mFeatureExtractor.listIdx( f ) for f in 
+                    ['funded_amnt', 'installment', 'earliest_cr_line']]
+        mRefData = np.delete( self.mFeatureExtractor.getTrainingData(), 
+                              mDropIdx, 1 )
+
+        # Extract w/ the filter pushed down into the InputReader
+        mFiltExtractor = LendingClubFeatureExtractor( InputReader( testFile ),
+                                                      pushdownFilterFile )
+        self.assertFalse( 'installment' in mFiltExtractor.getFeatures() )
+        self.assertEqual( mFiltExtractor.getTrainingData().shape[1], 
+                          len( mFiltExtractor.getFeatures() ) )
+        mFiltExtractor.extractFeatures()
+        mFiltExtractor.applyFeatureFilter()
+
+        np.testing.assert_array_equal( mFiltExtractor.getTrainingData(),
+                                       mRefData )
+
+
+    def test_rowFilter( self ):
+        '''Samples w/o a terminal loan status are skipped while reading'''
+
+        # Test resource holds one 'Current' and one undefined status sample
+        self.assertEqual( self.mInputReader.getSkippedCnt(), 2 )
+        self.assertEqual( self.mFeatureExtractor.getSampleCnt(), 15 )
+
+
+    def test_genFeatureChunks( self ):
+        '''Chunked extraction matches extraction of the whole file'''
+
+        # Extract the whole file in one go for reference
+        self.mFeatureExtractor.extractFeatures()
+        mRefData = self.mFeatureExtractor.getTrainingData()
+
+        # Stream the same file through in small chunks
+        mChunkExtractor = LendingClubFeatureExtractor(
+            InputReader( testFile ), filterTestFile, chunkSize=4 )
+        mChunks = list( mChunkExtractor.genFeatureChunks() )
+
+        # Assert the stitched chunks and removal count match the reference
+        np.testing.assert_array_equal( np.concatenate( mChunks ), mRefData )
+        self.assertEqual( mChunkExtractor.getRmvSampleCnt(),
+                          self.mFeatureExtractor.getRmvSampleCnt() )
+
+        # Assert the statistics accumulated over the chunks match the data
+        mStats = mChunkExtractor.getColumnStats()
+        self.assertEqual( mStats.count, len( mRefData ) )
+        np.testing.assert_allclose( mStats.mean, 
+                                    np.mean( mRefData, 0, dtype=np.float64 ) )
+        np.testing.assert_allclose( mStats.variance(), 
+                                    np.var( mRefData, 0, dtype=np.float64 ),
+                                    atol=1e-9 )
+
+
+    def test_runPipeline( self ):
+        '''Pipelined extraction writes the same dump and store'''
+
+        # Extract the whole file in one go for reference
+        self.mFeatureExtractor.extractFeatures()
+        mRefData = self.mFeatureExtractor.getTrainingData()
+
+        # Stream the file through to a dump and store, serially and w/ workers
+        mTmpDir = tempfile.TemporaryDirectory()
+        mDumpFile = os.path.join( mTmpDir.name, 'Dump.csv' )
+        mStoreFile = os.path.join( mTmpDir.name, 'Store.npy' )
+        for nJobs in [1, 2]:
+            mPipeExtractor = LendingClubFeatureExtractor(
+                InputReader( testFile ), filterTestFile, chunkSize=4 )
+            nSamples = mPipeExtractor.runPipeline( mDumpFile, mStoreFile, 
+                                                   nJobs, 1 )
+
+            # Assert both outputs hold the reference samples
+            self.assertEqual( nSamples, len( mRefData ) )
+            self.assertEqual( mPipeExtractor.getRmvSampleCnt(),
+                              self.mFeatureExtractor.getRmvSampleCnt() )
+            np.testing.assert_array_equal( np.load( mStoreFile ), mRefData )
+            with open( mDumpFile ) as f:
+                mRows = list( csv.reader( f ) )
+            self.assertEqual( mRows[0], self.mFeatureExtractor.getFeatures() )
+            np.testing.assert_array_equal( 
+                np.array( mRows[1:], dtype=mRefData.dtype ), mRefData )
+
+        mTmpDir.cleanup()
+
+
+    def test_dtype( self ):
+        '''Training data is float32 by default and float64 on request'''
+        self.mFeatureExtractor.extractFeatures()
+        mData = self.mFeatureExtractor.getTrainingData()
+        self.assertEqual( mData.dtype, np.float32 )
+
+        # Wider data holds the same samples
+        mWideExtractor = LendingClubFeatureExtractor( 
+            InputReader( testFile ), filterTestFile, dtype=np.float64 )
+        mWideExtractor.extractFeatures()
+        mWideData = mWideExtractor.getTrainingData()
+        self.assertEqual( mWideData.dtype, np.float64 )
+        np.testing.assert_array_equal( mWideData.astype( np.float32 ), mData )
+
+
+    def test_extractColumns( self ):
+        '''Columnar extraction matches the row-wise string matrix path'''
+
+        # Extract the whole file row by row for reference
+        self.mFeatureExtractor.extractFeatures()
+        mRefData = self.mFeatureExtractor.getTrainingData()
+
+        # Extract the same file from typed columns
+        mColExtractor = LendingClubFeatureExtractor(
+            InputReader( testFile ), filterTestFile, columnar=True )
+        mColExtractor.extractFeatures()
+
+        # Assert identical output and removal count
+        np.testing.assert_array_equal( mColExtractor.getTrainingData(), 
+                                       mRefData )
+        self.assertEqual( mColExtractor.getRmvSampleCnt(),
+                          self.mFeatureExtractor.getRmvSampleCnt() )
+
+
 if __name__ == '__main__':
     unittest.main()
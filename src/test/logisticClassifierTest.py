@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from inputReader import InputReader
+from lendingClubFeatureExtractor import LendingClubFeatureExtractor
+from logisticClassifier import LogisticClassifier
+from testFixtures import separableExtractor, separableSamples
+from sklearn import linear_model, preprocessing
+import numpy as np
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+# Test resource must be relative to class under test
+loanFile = '../../res/LoanSubSet3a.csv'
+loanFilterFile = '../../res/FeatureFilter.csv'
+
+class LogisticClassifierTest( unittest.TestCase ):
+
+    def setUp( self ):
+        '''Construct the class under test over noisy, separable samples'''
+        self.mFeatureExtractor = separableExtractor()
+        self.mLogisticClassifier = LogisticClassifier( self.mFeatureExtractor )
+        self.mLogisticClassifier.sampleSlice( 0.25 )
+
+        # Scaler dumps go to a temporary directory
+        self.tmpDir = tempfile.mkdtemp()
+        self.addCleanup( shutil.rmtree, self.tmpDir )
+        self.mLogisticClassifier.scalerPath = os.path.join( self.tmpDir, 
+                                                            'scaler' )
+
+    def test_regularizationPath( self ):
+        '''Test the warm started path matches cold fits and keeps the best'''
+        mCs, mCoefs, mScores = self.mLogisticClassifier.regularizationPath(
+            [1e2, 1e-2, 1] )
+
+        # Assert one ascending entry per value
+        np.testing.assert_array_equal( mCs, [1e-2, 1, 1e2] )
+        self.assertEqual( mCoefs.shape, ( 3, 1, 11 ) )
+        self.assertEqual( len( mScores ), 3 )
+
+        # Assert each warm started fit lands on the cold fit's solution
+        for C, coef in zip( mCs, mCoefs ):
+            mColdClf = linear_model.LogisticRegression( C=C ).fit(
+                self.mLogisticClassifier.X_train,
+                self.mLogisticClassifier.y_train )
+            np.testing.assert_allclose( coef, mColdClf.coef_, rtol=1e-2,
+                                        atol=1e-3 )
+
+        # Assert the classifier is left fitted w/ the best scoring value
+        best = np.argmax( mScores )
+        self.assertEqual( self.mLogisticClassifier.reg, mCs[best] )
+        self.assertEqual( self.mLogisticClassifier.clf.C,
+                          self.mLogisticClassifier.reg )
+        np.testing.assert_array_equal( self.mLogisticClassifier.clf.coef_,
+                                       mCoefs[best] )
+
+        # Assert the scores don't depend on the test subset
+        self.mLogisticClassifier.X_test = -self.mLogisticClassifier.X_test
+        mCs, mCoefs, mRetested = self.mLogisticClassifier.regularizationPath(
+            [1e2, 1e-2, 1] )
+        np.testing.assert_array_equal( mRetested, mScores )
+
+    def test_updateModel( self ):
+        '''Test updates w/ new samples land near a retrain on all samples'''
+        mData = separableSamples( self.mFeatureExtractor, 2000, ( 1, 0.25 ),
+                                  scale=np.arange( 1, 13 ), seed=1 )
+
+        def splitClassifier( data, reg=1 ):
+            self.mFeatureExtractor.setTrainingData( data )
+            mLogisticClassifier = LogisticClassifier( self.mFeatureExtractor )
+            mLogisticClassifier.scalerPath = os.path.join( self.tmpDir, 
+                                                            'scaler' )
+            mLogisticClassifier.setRegularization( reg )
+            mLogisticClassifier.sampleSlice( 0.1 )
+            return mLogisticClassifier
+
+        # Train on the history, then update w/ two batches of new samples by
+        # agents w/ another regularization of their own
+        mHistory = splitClassifier( mData[:1200] )
+        mHistory.standardizeSamples()
+        mHistory.trainModel()
+        clf = mHistory.clf
+        scaler = mHistory.scaler
+        mTrain = [mHistory.X_train * scaler.scale_ + scaler.mean_]
+        for data in [mData[1200:1600], mData[1600:]]:
+            mUpdate = splitClassifier( data, 1e5 )
+            mTrain.append( np.copy( mUpdate.X_train ) )
+            mUpdate.updateModel( clf, scaler )
+            clf = mUpdate.clf
+            scaler = mUpdate.scaler
+
+            # Assert the persisted model's C is kept
+            self.assertAlmostEqual( mUpdate.reg, 1 )
+            self.assertAlmostEqual( clf.alpha * scaler.n_samples_seen_, 1 )
+
+        # Assert the scaler statistics are those of all training samples
+        self.assertTrue( isinstance( clf, linear_model.SGDClassifier ) )
+        mScaler = preprocessing.StandardScaler().fit( np.vstack( mTrain ) )
+        np.testing.assert_allclose( scaler.mean_, mScaler.mean_, rtol=1e-4,
+                                    atol=1e-4 )
+        np.testing.assert_allclose( scaler.scale_, mScaler.scale_, rtol=1e-4 )
+
+        # Assert the model is close to a retrain on all samples
+        mFull = splitClassifier( mData )
+        mFull.standardizeSamples()
+        mFull.trainModel()
+        np.testing.assert_allclose( clf.coef_, mFull.clf.coef_, atol=0.1 )
+        np.testing.assert_allclose( clf.intercept_, mFull.clf.intercept_,
+                                    atol=0.1 )
+
+    def test_updateExtractedModel( self ):
+        '''
+        Test updating a model standardized from the extractor's column 
+        statistics, w/ the scaler read back from its dump
+        '''
+        def extractedClassifier():
+            mFeatureExtractor = LendingClubFeatureExtractor(
+                InputReader( loanFile ), loanFilterFile )
+            mFeatureExtractor.extractFeatures()
+            self.assertIsNotNone( mFeatureExtractor.getColumnStats() )
+
+            mLogisticClassifier = LogisticClassifier( mFeatureExtractor )
+            mLogisticClassifier.scalerPath = os.path.join( self.tmpDir, 
+                                                            'scaler' )
+            mLogisticClassifier.setRegularization( 1 )
+            mLogisticClassifier.sampleSlice( 0.2 )
+            return mLogisticClassifier
+
+        mHistory = extractedClassifier()
+        mHistory.standardizeSamples()
+        mHistory.trainModel()
+        with open( mHistory.scalerPath, 'rb' ) as f:
+            scaler = pickle.load( f )
+
+        mUpdate = extractedClassifier()
+        mUpdate.updateModel( mHistory.clf, scaler )
+
+        # Assert the update merged the persisted sample count
+        self.assertEqual( mUpdate.scaler.n_samples_seen_, 
+                          2 * len( mHistory.X_train ) )
+        self.assertEqual( mUpdate.clf.coef_.shape, mHistory.clf.coef_.shape )
+
+    def test_rescaleClassifier( self ):
+        '''Test rescaled coefficients keep the classifier's decisions'''
+        self.mLogisticClassifier.standardizeSamples()
+        self.mLogisticClassifier.trainModel()
+        X = self.mLogisticClassifier.X_test
+        mDecision = self.mLogisticClassifier.clf.decision_function( X )
+
+        # Same samples in terms of a shifted and stretched scaler
+        mScaler = self.mLogisticClassifier.scaler
+        mean = np.copy( mScaler.mean_ )
+        scale = np.copy( mScaler.scale_ )
+        mScaler.mean_ = mean + 1
+        mScaler.scale_ = scale * 2
+        self.mLogisticClassifier.rescaleClassifier( mean, scale )
+
+        mRescaled = self.mLogisticClassifier.clf.decision_function( 
+            ( X * scale + mean - mScaler.mean_ ) / mScaler.scale_ )
+        np.testing.assert_allclose( mRescaled, mDecision, rtol=1e-6 )
+
+if __name__ == '__main__':
+    unittest.main()
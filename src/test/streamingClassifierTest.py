@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from inputReader import InputReader
+from lendingClubFeatureExtractor import LendingClubFeatureExtractor
+from streamingClassifier import StreamingClassifier
+from sklearn import linear_model, preprocessing
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+# Test resource must be relative to class under test - the loan subset is
+# ordered by loan status
+testFile = '../../res/LoanSubSet3a.csv'
+filterFile = '../../res/FeatureFilter.csv'
+
+class StreamingClassifierTest( unittest.TestCase ):
+
+    def setUp( self ):
+        '''Dumps go to a temporary directory'''
+        self.tmpDir = tempfile.mkdtemp()
+        self.addCleanup( shutil.rmtree, self.tmpDir )
+
+    def streamingClassifier( self, model, chunkSize=100, bufferChunks=10 ):
+        '''@return agent: StreamingClassifier over the loan subset'''
+        mFeatureExtractor = LendingClubFeatureExtractor(
+            InputReader( testFile ), filterFile, chunkSize=chunkSize )
+        mStreamingClassifier = StreamingClassifier( mFeatureExtractor, model,
+                                                    3, bufferChunks )
+        mStreamingClassifier.scalerPath = os.path.join( self.tmpDir,
+                                                        'scaler.pickle' )
+        mStreamingClassifier.clfPath = os.path.join( self.tmpDir,
+                                                     'clf.pickle' )
+        return mStreamingClassifier
+
+    def inMemorySubsets( self, mStreamingClassifier ):
+        '''@return X_train, y_train, X_test, y_test: the streamed subsets'''
+        mSubsets = [list() for i in range( 4 )]
+        for X, y, isTest in mStreamingClassifier.genSamples():
+            mSubsets[0].append( X[~isTest] )
+            mSubsets[1].append( y[~isTest] )
+            mSubsets[2].append( X[isTest] )
+            mSubsets[3].append( y[isTest] )
+        mStreamingClassifier.featureExtractor.rewind()
+        return [np.concatenate( subset ) for subset in mSubsets]
+
+    def test_trainModel( self ):
+        '''Test both models learn the ordered input like an in-memory fit'''
+        mStreamingClassifier = self.streamingClassifier( 'logistic' )
+        X_train, y_train, X_test, y_test = self.inMemorySubsets(
+            mStreamingClassifier )
+        mScaler = preprocessing.StandardScaler().fit( X_train )
+        mScore = linear_model.LogisticRegression().fit(
+            mScaler.transform( X_train ), y_train ).score(
+                mScaler.transform( X_test ), y_test )
+
+        for model in ['logistic', 'SVM']:
+            mStreamingClassifier = self.streamingClassifier( model )
+            mStreamingClassifier.trainModel()
+            self.assertTrue( mStreamingClassifier.crossValidate() >
+                             mScore - 0.05 )
+            self.assertEqual( mStreamingClassifier.getClfCoeffs().shape,
+                              ( 1, 24 ) )
+
+        # Assert the logistic model gives probabilities
+        mStreamingClassifier = self.streamingClassifier( 'logistic' )
+        mStreamingClassifier.trainModel()
+        mProb = mStreamingClassifier.genProbPrediction( np.zeros( ( 2, 24 ) ) )
+        np.testing.assert_allclose( np.sum( mProb, 1 ), 1 )
+
+        # Assert the dumped scaler is the running one
+        mStreamingClassifier.dumpClassifier()
+        self.assertTrue( os.path.exists( mStreamingClassifier.scalerPath ) )
+        self.assertTrue( os.path.exists( mStreamingClassifier.clfPath ) )
+
+    def test_genShuffled( self ):
+        '''Test a pass yields every training sample once, mixed across chunks'''
+        mStreamingClassifier = self.streamingClassifier( 'logistic',
+                                                         bufferChunks=4 )
+        X_train, y_train, X_test, y_test = self.inMemorySubsets(
+            mStreamingClassifier )
+
+        mBatches = list( mStreamingClassifier.genShuffled(
+            np.random.RandomState( 0 ) ) )
+        X = np.concatenate( [X for X, y in mBatches] )
+        y = np.concatenate( [y for X, y in mBatches] )
+
+        # Assert the same samples, in another order
+        order = np.lexsort( X_train.T )
+        np.testing.assert_array_equal( X[np.lexsort( X.T )], X_train[order] )
+        self.assertEqual( np.sum( y ), np.sum( y_train ) )
+
+        # Assert the first batch of the status ordered input has both labels
+        self.assertTrue( 0 < np.mean( mBatches[0][1] ) < 1 )
+
+    def test_runningStatistics( self ):
+        '''Test running statistics match the training subset read in full'''
+        mStreamingClassifier = self.streamingClassifier( 'logistic' )
+        mStreamingClassifier.trainModel()
+
+        # Gather the training subset in one go
+        mTrain = list()
+        for X, y, isTest in mStreamingClassifier.genSamples():
+            self.assertTrue( len( X ) <= 100 )
+            mTrain.append( X[~isTest] )
+        mTrain = np.concatenate( mTrain )
+
+        # Assert every 5th sample is held out for testing, and left out of
+        # the extractor's statistics the scaler is built from
+        self.assertEqual( len( mTrain ), 793 )
+        self.assertEqual( mStreamingClassifier.scaler.n_samples_seen_, 793 )
+
+        mScaler = preprocessing.StandardScaler().fit( mTrain )
+        np.testing.assert_allclose( mStreamingClassifier.scaler.mean_,
+                                    mScaler.mean_, rtol=1e-5 )
+        np.testing.assert_allclose( mStreamingClassifier.scaler.scale_,
+                                    mScaler.scale_, rtol=1e-4 )
+
+if __name__ == '__main__':
+    unittest.main()
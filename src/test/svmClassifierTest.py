@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from svmClassifier import SVMClassifier
+from testFixtures import separableExtractor
+from sklearn import svm, pipeline
+import numpy as np
+import unittest
+
+class SVMClassifierTest( unittest.TestCase ):
+
+    def setUp( self ):
+        '''Set up a FeatureExtractor over noisy, separable samples'''
+        self.mFeatureExtractor = separableExtractor( noise=0.5 )
+
+    def test_scalableMode( self ):
+        '''Test the scalable solvers train and score like the exact SVM'''
+        mScores = dict()
+        for kernel in ['linear', 'rbf']:
+            for mode in ['exact', 'scalable']:
+                mSVMClassifier = SVMClassifier( self.mFeatureExtractor, kernel,
+                                                mode, nComponents=50 )
+                mSVMClassifier.sampleSlice( 0.25 )
+                mSVMClassifier.trainModel()
+                mScores[kernel, mode] = mSVMClassifier.crossValidate()
+
+                # Assert the solver matches the mode and kernel
+                if mode == 'exact':
+                    self.assertTrue( isinstance( mSVMClassifier.clf, svm.SVC ) )
+                elif kernel == 'linear':
+                    self.assertTrue( isinstance( mSVMClassifier.clf,
+                                                 svm.LinearSVC ) )
+                else:
+                    self.assertTrue( isinstance( mSVMClassifier.clf,
+                                                 pipeline.Pipeline ) )
+
+        # Assert the approximations lose little accuracy
+        for kernel in ['linear', 'rbf']:
+            self.assertTrue( mScores[kernel, 'scalable'] > 0.7 )
+            self.assertTrue( mScores[kernel, 'scalable'] >
+                             mScores[kernel, 'exact'] - 0.1 )
+
+    def test_calibration( self ):
+        '''Test probabilities come from a separately calibrated classifier'''
+        mSVMClassifier = SVMClassifier( self.mFeatureExtractor )
+        mSVMClassifier.sampleSlice( 0.25 )
+        mSVMClassifier.trainModel()
+
+        # Assert the bare classifier was fit w/o the calibration slice
+        self.assertEqual( mSVMClassifier.clf.shape_fit_[0], 120 )
+        self.assertIsNot( mSVMClassifier.clf.probability, True )
+
+        # Assert calibrated probabilities are well formed and confident on
+        # separable samples
+        mProb = mSVMClassifier.genProbPrediction( mSVMClassifier.X_test )
+        self.assertEqual( mProb.shape, ( 50, 2 ) )
+        np.testing.assert_allclose( np.sum( mProb, 1 ), 1 )
+        self.assertTrue( np.mean( np.argmax( mProb, 1 ) == 
+                                  mSVMClassifier.y_test ) > 0.7 )
+
+        # Assert training w/o calibration uses every training sample
+        mSVMClassifier.setCalibration( None )
+        mSVMClassifier.trainModel()
+        self.assertEqual( mSVMClassifier.clf.shape_fit_[0], 150 )
+        self.assertIsNone( mSVMClassifier.calibratedClf )
+        self.assertRaises( AssertionError, mSVMClassifier.genProbPrediction,
+                           mSVMClassifier.X_test )
+
+    def test_setters( self ):
+        '''Test setters rebuild the classifier in the same mode'''
+        mSVMClassifier = SVMClassifier( self.mFeatureExtractor, 'rbf',
+                                        'scalable' )
+        mSVMClassifier.setKernelType( 'linear' )
+        mSVMClassifier.setRegularization( 10 )
+        self.assertTrue( isinstance( mSVMClassifier.clf, svm.LinearSVC ) )
+        self.assertEqual( mSVMClassifier.clf.C, 10 )
+
+if __name__ == '__main__':
+    unittest.main()
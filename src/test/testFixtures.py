@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+
+import sys
+sys.path.append( '..' )
+from inputReader import InputReader
+from lendingClubFeatureExtractor import LendingClubFeatureExtractor
+import numpy as np
+
+# Test resource must be relative to class under test
+testFile = '../../res/LendingClubFeatureExtractorTest.csv'
+filterFile = '../../res/FeatureFilterTest.csv'
+
+def loanExtractor():
+    '''@return featureExtractor: LendingClubFeatureExtractor over the test
+    resource, for samples pushed in w/ setTrainingData()'''
+    return LendingClubFeatureExtractor( InputReader( testFile ), filterFile )
+
+def separableSamples( featureExtractor, nSamples=200, weights=( 1, 1 ),
+                      noise=1.0, scale=1.0, seed=0 ):
+    '''
+    Noisy, linearly separable samples w/ the label in its schema column
+    @param featureExtractor: FeatureExtractor giving the label column
+    @param nSamples: number of samples
+    @param weights: weights of the first two features in the label
+    @param noise: standard deviation of the noise added before thresholding
+    @param scale: scale of the features, a scalar or one per column
+    @param seed: seed of the samples
+    @return data: nSamples by 12 normally distributed samples, the label
+    column set where the weighted first two features plus noise are positive
+    '''
+    m_yIdx = featureExtractor.listIdx( 'loan_status' )
+    mRandom = np.random.RandomState( seed )
+    mData = mRandom.normal( size=( nSamples, 12 ) ) * scale
+    mData[:, m_yIdx] = ( weights[0] * mData[:, 0] + weights[1] * mData[:, 1] +
+                         noise * mRandom.normal( size=nSamples ) ) > 0
+    return mData
+
+def separableExtractor( **kwargs ):
+    '''
+    @param kwargs: separableSamples() arguments
+    @return featureExtractor: loanExtractor() holding separableSamples()
+    '''
+    mFeatureExtractor = loanExtractor()
+    mFeatureExtractor.setTrainingData( separableSamples( mFeatureExtractor,
+                                                         **kwargs ) )
+    return mFeatureExtractor